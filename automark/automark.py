@@ -1,9 +1,19 @@
 """
 Extended private test suite to ensure correct implementation.
+
+Tests run concurrently on a small worker pool (AUTOMARK_WORKERS or --workers,
+1 for the old serial run). Each test names its students with its own prefix
+and removes them afterwards. Tests that compare whole-table results against
+/students and /stats are marked exclusive and run with no other test in
+flight, while the rest share the table freely.
 """
 
+import argparse
+import os
+import threading
 import time
 import sys
+from concurrent.futures import ThreadPoolExecutor
 import psycopg2
 import requests
 
@@ -29,50 +39,81 @@ def check(condition, msg):
 
 
 def wait_for_backend(timeout_seconds=25):
-    start = time.time()
+    # Poll quickly at first, backing off so a slow start is not hammered
+    deadline = time.time() + timeout_seconds
+    delay = 0.05
     last_error = None
-    while time.time() - start < timeout_seconds:
+    while time.time() < deadline:
         try:
-            r = requests.get(f"{BASE_URL}/")
+            r = requests.get(f"{BASE_URL}/", timeout=2)
             if r.status_code == 200:
                 return
         except Exception as e:
             last_error = e
-        time.sleep(1)
+        time.sleep(delay)
+        delay = min(delay * 2, 1.0)
     fail(f"Backend did not become ready in time (last_error={last_error})")
 
 
+# One HTTP session and one db connection per worker thread, reused across tests
+_local = threading.local()
+
+
+def http():
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
 def db_connection():
-    return psycopg2.connect(**DB_CONFIG)
+    conn = getattr(_local, "conn", None)
+    if conn is None or conn.closed:
+        conn = _local.conn = psycopg2.connect(**DB_CONFIG)
+        conn.autocommit = True
+    return conn
+
+
+def db_fetchall(sql, params=None):
+    with db_connection().cursor() as cur:
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+
+def db_fetchone(sql, params=None):
+    with db_connection().cursor() as cur:
+        cur.execute(sql, params)
+        return cur.fetchone()
 
 
 def get_db_students():
-    conn = db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, name, course, mark FROM students ORDER BY id;")
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+    rows = db_fetchall("SELECT id, name, course, mark FROM students ORDER BY id;")
     return [{"id": r[0], "name": r[1], "course": r[2], "mark": r[3]} for r in rows]
 
 
-def cleanup_test_students():
+def student_name(label):
     """
-    Remove autotest rows created from other tests
+    Name for a student created by the running test; the prefix is unique per
+    test so its rows can be cleaned up without touching another test's.
     """
-    conn = db_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM students WHERE name LIKE 'Autotest %';")
-    conn.commit()
-    cur.close()
-    conn.close()
+    return f"{_local.prefix}{label}"
+
+
+def cleanup_test_students(prefix="Autotest "):
+    """
+    Remove autotest rows created from other tests (or from one test, by prefix)
+    """
+    with db_connection().cursor() as cur:
+        cur.execute(
+            "DELETE FROM students WHERE name LIKE %s;",
+            (prefix.replace("%", r"\%").replace("_", r"\_") + "%",),
+        )
 
 
 def get_students():
     """
     Basic check for getting students
     """
-    r = requests.get(f"{BASE_URL}/students")
+    r = http().get(f"{BASE_URL}/students")
     check(r.status_code == 200, f"GET /students expected 200, got {r.status_code}")
     data = r.json()
     check(
@@ -86,7 +127,7 @@ def get_stats():
     """
     Basic check for stats having the right format
     """
-    r = requests.get(f"{BASE_URL}/stats")
+    r = http().get(f"{BASE_URL}/stats")
     check(r.status_code == 200, f"GET /stats expected 200, got {r.status_code}")
     stats = r.json()
     for key in ("count", "average", "min", "max"):
@@ -98,7 +139,7 @@ def create_student(payload):
     """
     Create student with provided payload
     """
-    res = requests.post(f"{BASE_URL}/students", json=payload)
+    res = http().post(f"{BASE_URL}/students", json=payload)
     try:
         body = res.json()
     except Exception:
@@ -111,7 +152,7 @@ def test_health_check():
     """
     Basic health check
     """
-    res = requests.get(f"{BASE_URL}/")
+    res = http().get(f"{BASE_URL}/")
     check(
         res.status_code == 200, f"Health endpoint expected 200, got {res.status_code}"
     )
@@ -175,7 +216,7 @@ def test_create_student_persists_and_updates_stats():
     stats_before = get_stats()
 
     payload = {
-        "name": "Autotest student 1",
+        "name": student_name("student 1"),
         "course": "COMP3900",
         "mark": 75,
     }
@@ -190,12 +231,7 @@ def test_create_student_persists_and_updates_stats():
     check(body["mark"] == payload["mark"], "Created student mark mismatch")
 
     # Confirm it is in DB
-    conn = db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT name, course, mark FROM students WHERE id = %s;", (student_id,))
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
+    row = db_fetchone("SELECT name, course, mark FROM students WHERE id = %s;", (student_id,))
     check(row is not None, "Created student not found in DB by id")
     check(
         row[0] == payload["name"]
@@ -249,7 +285,7 @@ def test_create_student_without_mark_has_mark_field():
     Add student with empty mark field (remove assumptions that FE has correct input)
     """
     payload = {
-        "name": "Autotest NoMark",
+        "name": student_name("NoMark"),
         "course": "COMP3900",
     }
     r, body = create_student(payload)
@@ -273,17 +309,17 @@ def test_update_existing_student_changes_db_and_response():
     """
     # Create a fresh student to update
     res_create, created = create_student(
-        {"name": "Autotest Update", "course": "COMP3900", "mark": 40}
+        {"name": student_name("Update"), "course": "COMP3900", "mark": 40}
     )
     check(res_create.status_code == 200, "Failed to create student for update test")
     student_id = created["id"]
 
     update_payload = {
-        "name": "Autotest Updated",
+        "name": student_name("Updated"),
         "course": "COMP3900",
         "mark": 90,
     }
-    res = requests.put(f"{BASE_URL}/students/{student_id}", json=update_payload)
+    res = http().put(f"{BASE_URL}/students/{student_id}", json=update_payload)
     check(
         res.status_code == 200,
         f"PUT /students/{student_id} expected 200, got {res.status_code}",
@@ -295,12 +331,7 @@ def test_update_existing_student_changes_db_and_response():
     check(body["name"] == update_payload["name"], "Updated student name mismatch")
     check(body["mark"] == update_payload["mark"], "Updated student mark mismatch")
 
-    conn = db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT name, course, mark FROM students WHERE id = %s;", (student_id,))
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
+    row = db_fetchone("SELECT name, course, mark FROM students WHERE id = %s;", (student_id,))
     check(row is not None, "Updated student not found in DB by id")
     check(
         row[0] == update_payload["name"]
@@ -318,7 +349,7 @@ def test_update_nonexistent_student():
     max_id = max((s["id"] for s in db_students), default=0)
     missing_id = max_id + 10_000
     payload = {"name": "RandomStudent", "course": "COMP3900", "mark": 10}
-    res = requests.put(f"{BASE_URL}/students/{missing_id}", json=payload)
+    res = http().put(f"{BASE_URL}/students/{missing_id}", json=payload)
     check(
         res.status_code == 404,
         f"PUT /students/{missing_id} should return 404, got {res.status_code}",
@@ -330,12 +361,12 @@ def test_delete_existing_student_removes_from_db():
     Deleting an existing student should remove the student row from the DB and the student should disappear from /students.
     """
     r_create, created = create_student(
-        {"name": "Autotest Delete", "course": "COMP3900", "mark": 55}
+        {"name": student_name("Delete"), "course": "COMP3900", "mark": 55}
     )
     check(r_create.status_code == 200, "Failed to create student for delete test")
     student_id = created["id"]
 
-    r = requests.delete(f"{BASE_URL}/students/{student_id}")
+    r = http().delete(f"{BASE_URL}/students/{student_id}")
     check(
         r.status_code == 200,
         f"DELETE /students/{student_id} expected 200, got {r.status_code}",
@@ -348,12 +379,7 @@ def test_delete_existing_student_removes_from_db():
         f"Student id {student_id} still present in /students after DELETE",
     )
 
-    conn = db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM students WHERE id = %s;", (student_id,))
-    count = cur.fetchone()[0]
-    cur.close()
-    conn.close()
+    count = db_fetchone("SELECT COUNT(*) FROM students WHERE id = %s;", (student_id,))[0]
     check(count == 0, "Student row still exists in DB after DELETE")
 
 
@@ -364,7 +390,7 @@ def test_delete_nonexistent_student():
     db_students = get_db_students()
     max_id = max((s["id"] for s in db_students), default=0)
     missing_id = max_id + 20_000
-    r = requests.delete(f"{BASE_URL}/students/{missing_id}")
+    r = http().delete(f"{BASE_URL}/students/{missing_id}")
     check(
         r.status_code == 404,
         f"DELETE /students/{missing_id} should return 404, got {r.status_code}",
@@ -383,7 +409,7 @@ def test_delete_student_updates_stats():
 
     # Create a student with a known mark
     res_create, created = create_student(
-        {"name": "Autotest Delete Stats", "course": "COMP3900", "mark": 60}
+        {"name": student_name("Delete Stats"), "course": "COMP3900", "mark": 60}
     )
     check(
         res_create.status_code == 200, "Failed to create student for delete-stats test"
@@ -418,7 +444,7 @@ def test_delete_student_updates_stats():
     )
 
     # Delete student id
-    res = requests.delete(f"{BASE_URL}/students/{student_id}")
+    res = http().delete(f"{BASE_URL}/students/{student_id}")
     check(
         res.status_code == 200,
         f"DELETE /students/{student_id} expected 200, got {res.status_code}",
@@ -497,48 +523,133 @@ def test_stats_matches_students_marks():
     )
 
 
+class ReadWriteLock:
+    """
+    Shared/exclusive lock: shared tests run together, an exclusive test waits
+    for them to drain and then runs alone. Waiting exclusive tests block new
+    shared ones so they are never starved.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._shared = 0
+        self._exclusive = False
+        self._waiting_exclusive = 0
+
+    def acquire(self, exclusive):
+        with self._cond:
+            if exclusive:
+                self._waiting_exclusive += 1
+                self._cond.wait_for(lambda: not self._exclusive and self._shared == 0)
+                self._waiting_exclusive -= 1
+                self._exclusive = True
+            else:
+                self._cond.wait_for(lambda: not self._exclusive and not self._waiting_exclusive)
+                self._shared += 1
+
+    def release(self, exclusive):
+        with self._cond:
+            if exclusive:
+                self._exclusive = False
+            else:
+                self._shared -= 1
+            self._cond.notify_all()
+
+
+# (name, function, exclusive) - exclusive tests compare whole-table results
+# and must not see other tests' writes
+TESTS = [
+    ("health_check", test_health_check, False),
+    (
+        "get_students_structure_and_db_consistency",
+        test_get_students_structure_and_db_consistency,
+        True,
+    ),
+    (
+        "create_student_persists_and_updates_stats",
+        test_create_student_persists_and_updates_stats,
+        True,
+    ),
+    (
+        "create_student_without_mark_has_mark_field",
+        test_create_student_without_mark_has_mark_field,
+        False,
+    ),
+    (
+        "update_existing_student_changes_db_and_response",
+        test_update_existing_student_changes_db_and_response,
+        False,
+    ),
+    ("update_nonexistent_student_returns_404", test_update_nonexistent_student, False),
+    (
+        "delete_existing_student_removes_from_db",
+        test_delete_existing_student_removes_from_db,
+        False,
+    ),
+    ("delete_nonexistent_student_returns_404", test_delete_nonexistent_student, False),
+    ("delete_student_updates_stats", test_delete_student_updates_stats, True),
+    ("stats_matches_students_marks", test_stats_matches_students_marks, True),
+]
+
+
+def run_test(index, name, fn, exclusive, lock):
+    """
+    Run one test under the shared/exclusive lock with its own name prefix.
+    Returns: (name, seconds, error message or None)
+    """
+    _local.prefix = f"Autotest t{index:02d} "
+    lock.acquire(exclusive)
+    start = time.perf_counter()
+    try:
+        fn()
+        error = None
+    except AssertionError as e:
+        error = str(e)
+    except Exception as e:
+        error = f"Unexpected error: {e}"
+    finally:
+        try:
+            cleanup_test_students(_local.prefix)
+        except Exception as e:
+            error = error or f"Cleanup failed: {e}"
+        lock.release(exclusive)
+    elapsed = time.perf_counter() - start
+    print(f"[{'OK' if error is None else 'FAIL'}] {name} ({elapsed:.2f}s)", flush=True)
+    return name, elapsed, error
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Run the automark test suite")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("AUTOMARK_WORKERS", "4")),
+        help="tests to run at once (1 runs them in order, one by one)",
+    )
+    args = parser.parse_args()
+
     print("Waiting for backend to become ready...")
     wait_for_backend()
     cleanup_test_students()
 
-    tests = [
-        ("health_check", test_health_check),
-        (
-            "get_students_structure_and_db_consistency",
-            test_get_students_structure_and_db_consistency,
-        ),
-        (
-            "create_student_persists_and_updates_stats",
-            test_create_student_persists_and_updates_stats,
-        ),
-        (
-            "create_student_without_mark_has_mark_field",
-            test_create_student_without_mark_has_mark_field,
-        ),
-        (
-            "update_existing_student_changes_db_and_response",
-            test_update_existing_student_changes_db_and_response,
-        ),
-        ("update_nonexistent_student_returns_404", test_update_nonexistent_student),
-        (
-            "delete_existing_student_removes_from_db",
-            test_delete_existing_student_removes_from_db,
-        ),
-        ("delete_nonexistent_student_returns_404", test_delete_nonexistent_student),
-        ("delete_student_updates_stats", test_delete_student_updates_stats),
-        ("stats_matches_students_marks", test_stats_matches_students_marks),
-    ]
-
-    try:
-        for name, fn in tests:
-            print(f"Running {name}...")
-            fn()
-            print(f"[OK] {name}")
-    except AssertionError as e:
-        fail(str(e))
-    except Exception as e:
-        fail(f"Unexpected error: {e}")
+    lock = ReadWriteLock()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(args.workers, 1)) as pool:
+        futures = [
+            pool.submit(run_test, index, name, fn, exclusive, lock)
+            for index, (name, fn, exclusive) in enumerate(TESTS, 1)
+        ]
+        results = [f.result() for f in futures]
+    wall = time.perf_counter() - started
+
+    print("\nTimings:")
+    for name, elapsed, error in sorted(results, key=lambda r: -r[1]):
+        print(f"  {elapsed:7.2f}s  {name}{'  (FAILED)' if error else ''}")
+    print(f"  {wall:7.2f}s  wall clock ({sum(r[1] for r in results):.2f}s of test time)")
+
+    failures = [(name, error) for name, _, error in results if error is not None]
+    if failures:
+        fail("\n  ".join(f"{name}: {error}" for name, error in failures))
 
     print("ALL AUTOTESTS PASSED (show output to your tutor)")
 
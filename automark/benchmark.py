@@ -0,0 +1,332 @@
+"""
+Load-testing and latency benchmark for the backend.
+
+Seeds the compose Postgres with N benchmark students, drives a mixed
+read/write workload at a fixed concurrency and reports requests per second
+and p50/p95/p99 latency per endpoint as JSON. Exits non-zero when a latency
+or throughput budget is exceeded, so it can gate regressions.
+
+Run locally against docker-compose.yml:
+    docker compose --profile bench up --build bench
+or from the host with the stack up:
+    BASE_URL=http://localhost:5000 DB_HOST=localhost python automark/benchmark.py --seed 100000
+
+Budget file (JSON), keyed by endpoint name as it appears in the report:
+    {"GET /students?page": {"p95_ms": 50, "min_rps": 200}, "*": {"p99_ms": 500}}
+"*" applies to every endpoint; an endpoint's own entry overrides it key by key.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+import requests
+from psycopg2.extras import execute_values
+
+BASE_URL = os.environ.get("BASE_URL", "http://backend:5000")
+DB_CONFIG = {
+    "host": os.environ.get("DB_HOST", "db"),
+    "database": os.environ.get("DB_NAME", "marksdb"),
+    "user": os.environ.get("DB_USER", "marksuser"),
+    "password": os.environ.get("DB_PASSWORD", "markspass"),
+}
+
+# Benchmark rows are tagged so they can be removed without touching real data
+BENCH_PREFIX = "Bench "
+COURSES = ["COMP1511", "COMP1531", "COMP2521", "COMP3311", "COMP3900", "COMP6080"]
+
+# Default workload mix: relative weights of each operation
+DEFAULT_MIX = {
+    "GET /": 5,
+    "GET /stats": 20,
+    "GET /stats/courses": 5,
+    "GET /students?page": 40,
+    "GET /students/<id>": 10,
+    "POST /students": 10,
+    "PUT /students/<id>": 7,
+    "DELETE /students/<id>": 3,
+}
+
+
+def db_connection():
+    return psycopg2.connect(**DB_CONFIG)
+
+
+def wait_for_backend(timeout_seconds=60):
+    deadline = time.time() + timeout_seconds
+    delay = 0.1
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{BASE_URL}/", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(delay)
+        delay = min(delay * 2, 2.0)
+    sys.exit("Backend did not become ready in time")
+
+
+def cleanup_bench_students():
+    conn = db_connection()
+    cur = conn.cursor()
+    cur.execute("DELETE FROM students WHERE name LIKE %s;", (BENCH_PREFIX + "%",))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def seed_students(n, batch=10_000):
+    """
+    Insert n benchmark students straight into Postgres in large batches.
+    Returns: list of the new ids
+    """
+    conn = db_connection()
+    cur = conn.cursor()
+    rng = random.Random(3900)
+    ids = []
+    for start in range(0, n, batch):
+        rows = [
+            (f"{BENCH_PREFIX}{i}", rng.choice(COURSES), rng.randint(0, 100))
+            for i in range(start, min(start + batch, n))
+        ]
+        ids.extend(
+            r[0]
+            for r in execute_values(
+                cur,
+                "INSERT INTO students (name, course, mark) VALUES %s RETURNING id;",
+                rows,
+                page_size=batch,
+                fetch=True,
+            )
+        )
+        conn.commit()
+    cur.execute("ANALYZE students;")
+    conn.commit()
+    cur.close()
+    conn.close()
+    return ids
+
+
+class Workload:
+    """Picks operations by weight and tracks the ids it can safely touch."""
+
+    def __init__(self, ids, mix, seed=0):
+        self.ids = list(ids)
+        self.lock = threading.Lock()
+        self.ops = list(mix)
+        self.weights = [mix[op] for op in self.ops]
+        self.rng = random.Random(seed)
+        self.counter = 0
+
+    def pick(self):
+        with self.lock:
+            return self.rng.choices(self.ops, self.weights)[0]
+
+    def random_id(self):
+        with self.lock:
+            return self.rng.choice(self.ids) if self.ids else 1
+
+    def take_id(self):
+        with self.lock:
+            if not self.ids:
+                return None
+            return self.ids.pop(self.rng.randrange(len(self.ids)))
+
+    def add_id(self, student_id):
+        with self.lock:
+            self.ids.append(student_id)
+
+    def next_name(self):
+        with self.lock:
+            self.counter += 1
+            return f"{BENCH_PREFIX}load {self.counter}"
+
+
+def run_operation(session, workload, op):
+    """
+    Perform one request of the given kind.
+    Returns: the HTTP status code
+    """
+    if op == "GET /":
+        return session.get(f"{BASE_URL}/").status_code
+    if op == "GET /stats":
+        return session.get(f"{BASE_URL}/stats").status_code
+    if op == "GET /stats/courses":
+        return session.get(f"{BASE_URL}/stats/courses").status_code
+    if op == "GET /students?page":
+        params = {"limit": 50, "course": random.choice(COURSES), "sort": "mark", "order": "desc"}
+        return session.get(f"{BASE_URL}/students", params=params).status_code
+    if op == "GET /students":
+        return session.get(f"{BASE_URL}/students").status_code
+    if op == "GET /students/<id>":
+        return session.get(f"{BASE_URL}/students/{workload.random_id()}").status_code
+    if op == "POST /students":
+        payload = {"name": workload.next_name(), "course": random.choice(COURSES), "mark": random.randint(0, 100)}
+        r = session.post(f"{BASE_URL}/students", json=payload)
+        if r.status_code == 200:
+            workload.add_id(r.json()["id"])
+        return r.status_code
+    if op == "PUT /students/<id>":
+        payload = {"mark": random.randint(0, 100)}
+        return session.put(f"{BASE_URL}/students/{workload.random_id()}", json=payload).status_code
+    if op == "DELETE /students/<id>":
+        student_id = workload.take_id()
+        if student_id is None:
+            return 404
+        return session.delete(f"{BASE_URL}/students/{student_id}").status_code
+    raise ValueError(f"unknown operation {op!r}")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_load(workload, concurrency, duration, requests_total=None):
+    """
+    Drive the workload from `concurrency` threads for `duration` seconds
+    (or until requests_total requests have been made).
+    Returns: (dict of op -> list of (latency_seconds, status)), elapsed seconds
+    """
+    samples = {op: [] for op in workload.ops}
+    samples_lock = threading.Lock()
+    issued = [0]
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        session = requests.Session()
+        local = []
+        while time.perf_counter() < deadline:
+            if requests_total is not None:
+                with samples_lock:
+                    if issued[0] >= requests_total:
+                        break
+                    issued[0] += 1
+            op = workload.pick()
+            start = time.perf_counter()
+            try:
+                status = run_operation(session, workload, op)
+            except requests.RequestException:
+                status = 0
+            local.append((op, time.perf_counter() - start, status))
+        with samples_lock:
+            for op, latency, status in local:
+                samples[op].append((latency, status))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return samples, time.perf_counter() - started
+
+
+def summarise(samples, elapsed):
+    report = {}
+    for op, results in samples.items():
+        if not results:
+            continue
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(1 for _, status in results if status == 0 or status >= 500)
+        report[op] = {
+            "requests": len(results),
+            "errors": errors,
+            "rps": round(len(results) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2),
+        }
+    return report
+
+
+def check_budget(report, budget):
+    """
+    Compare the report against the budget.
+    Returns: list of human-readable violations (empty when within budget)
+    """
+    violations = []
+    for op, result in report.items():
+        # An endpoint's own entry overrides "*" key by key rather than replacing it
+        limits = {**budget.get("*", {}), **budget.get(op, {})}
+        for key in ("p50_ms", "p95_ms", "p99_ms", "max_ms"):
+            if key in limits and result[key] > limits[key]:
+                violations.append(f"{op}: {key} {result[key]} > budget {limits[key]}")
+        if "min_rps" in limits and result["rps"] < limits["min_rps"]:
+            violations.append(f"{op}: rps {result['rps']} < budget {limits['min_rps']}")
+        if "max_error_rate" in limits and result["errors"] / result["requests"] > limits["max_error_rate"]:
+            violations.append(f"{op}: error rate above {limits['max_error_rate']}")
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=int(os.environ.get("BENCH_SEED", "1000")),
+                        help="number of students to seed (e.g. 1000, 100000, 1000000)")
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get("BENCH_CONCURRENCY", "16")))
+    parser.add_argument("--duration", type=float, default=float(os.environ.get("BENCH_DURATION", "30")),
+                        help="seconds to run the workload for")
+    parser.add_argument("--requests", type=int, default=None, help="stop after this many requests")
+    parser.add_argument("--mix", default=os.environ.get("BENCH_MIX"),
+                        help='JSON object of operation weights, e.g. {"GET /stats": 1}')
+    parser.add_argument("--budget", default=os.environ.get("BENCH_BUDGET"),
+                        help="path to a JSON latency/throughput budget")
+    parser.add_argument("--output", default=os.environ.get("BENCH_OUTPUT"),
+                        help="also write the JSON report to this file")
+    parser.add_argument("--keep", action="store_true", help="keep seeded rows afterwards")
+    args = parser.parse_args()
+
+    mix = json.loads(args.mix) if args.mix else DEFAULT_MIX
+    budget = {}
+    if args.budget:
+        with open(args.budget) as f:
+            budget = json.load(f)
+
+    wait_for_backend()
+    cleanup_bench_students()
+    print(f"Seeding {args.seed} students...", file=sys.stderr)
+    seed_started = time.perf_counter()
+    ids = seed_students(args.seed)
+    seed_seconds = time.perf_counter() - seed_started
+
+    try:
+        print(f"Running for {args.duration}s at concurrency {args.concurrency}...", file=sys.stderr)
+        samples, elapsed = run_load(Workload(ids, mix), args.concurrency, args.duration, args.requests)
+    finally:
+        if not args.keep:
+            cleanup_bench_students()
+
+    endpoints = summarise(samples, elapsed)
+    total = sum(r["requests"] for r in endpoints.values())
+    report = {
+        "base_url": BASE_URL,
+        "seeded_students": args.seed,
+        "seed_seconds": round(seed_seconds, 2),
+        "concurrency": args.concurrency,
+        "elapsed_seconds": round(elapsed, 2),
+        "total_requests": total,
+        "total_rps": round(total / elapsed, 2) if elapsed else 0,
+        "endpoints": endpoints,
+    }
+    violations = check_budget(endpoints, budget)
+    report["budget_violations"] = violations
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    if violations:
+        print("BENCHMARK BUDGET EXCEEDED:", *violations, sep="\n  ", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
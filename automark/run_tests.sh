@@ -1,3 +1,4 @@
 #!/bin/sh
+# AUTOMARK_WORKERS sets how many automark tests run at once (1 = serial)
 python sanity_check.py &&
-python automark.py
\ No newline at end of file
+python automark.py --workers "${AUTOMARK_WORKERS:-4}"
@@ -9,14 +9,29 @@ import psycopg2
 import time
 import sys
 
-time.sleep(3)
-
 
 def fail(msg):
     print("FAIL:", msg)
     sys.exit(1)
 
 
+def wait_for_backend(timeout_seconds=25):
+    # Poll with backoff instead of sleeping a fixed time up front
+    deadline = time.time() + timeout_seconds
+    delay = 0.05
+    while time.time() < deadline:
+        try:
+            if requests.get("http://backend:5000/", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(delay)
+        delay = min(delay * 2, 1.0)
+    fail("Backend did not become ready in time")
+
+
+wait_for_backend()
+
 # Health
 r = requests.get("http://backend:5000/")
 if r.status_code != 200:
@@ -0,0 +1,45 @@
+"""
+Unit tests for the benchmark's budget check (no backend or database needed):
+    python -m pytest automark/test_benchmark.py
+"""
+
+from benchmark import check_budget
+
+
+def result(**overrides):
+    values = {"requests": 100, "errors": 0, "rps": 500.0,
+              "p50_ms": 5.0, "p95_ms": 20.0, "p99_ms": 40.0, "max_ms": 60.0}
+    values.update(overrides)
+    return values
+
+
+def test_within_budget():
+    report = {"GET /stats": result()}
+    assert check_budget(report, {"*": {"p99_ms": 500}, "GET /stats": {"p95_ms": 50}}) == []
+
+
+def test_wildcard_applies_to_endpoints_without_an_entry():
+    report = {"GET /stats": result(p99_ms=900.0)}
+    assert check_budget(report, {"*": {"p99_ms": 500}}) == ["GET /stats: p99_ms 900.0 > budget 500"]
+
+
+def test_endpoint_entry_keeps_wildcard_limits_it_does_not_set():
+    # The endpoint only sets p95_ms; the wildcard p99_ms must still be checked
+    report = {"GET /stats": result(p99_ms=900.0)}
+    budget = {"*": {"p99_ms": 500}, "GET /stats": {"p95_ms": 50}}
+    assert check_budget(report, budget) == ["GET /stats: p99_ms 900.0 > budget 500"]
+
+
+def test_endpoint_entry_overrides_wildcard_key():
+    report = {"GET /stats": result(p99_ms=900.0)}
+    budget = {"*": {"p99_ms": 500}, "GET /stats": {"p99_ms": 1000}}
+    assert check_budget(report, budget) == []
+
+
+def test_throughput_and_error_rate():
+    report = {"POST /students": result(rps=50.0, errors=10)}
+    budget = {"*": {"max_error_rate": 0.05}, "POST /students": {"min_rps": 100}}
+    assert check_budget(report, budget) == [
+        "POST /students: rps 50.0 < budget 100",
+        "POST /students: error rate above 0.05",
+    ]
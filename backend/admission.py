@@ -0,0 +1,196 @@
+"""
+Admission control: per-class concurrency limits and per-client rate limits.
+
+Every request is put in a class by app.py. Each class has a concurrency limit
+per worker process; a request that cannot get a slot within ADMISSION_WAIT_MS
+is shed with 503 + Retry-After instead of queueing behind a slow database.
+ADMISSION_LIMITS ("bulk=2,default=3") overrides the defaults: half of
+GUNICORN_THREADS for bulk reads and writes and one fewer than GUNICORN_THREADS
+for everything else, leaving headroom for the "critical" class (/, health,
+/metrics), which does not touch the database and is never limited or
+rate-limited. GET /stats reads the database, so its "stats" class gets a high
+but finite limit (GUNICORN_THREADS) and the usual deadline and rate checks.
+SSE streams on /students/changes form a "stream" class capped at
+GUNICORN_THREADS - 2, since each one holds a thread for minutes.
+
+Requests that already waited longer than ADMISSION_MAX_QUEUE_MS before
+reaching the app (per the X-Request-Start header nginx adds) are shed
+straight away, since the client has most likely given up.
+
+RATE_LIMIT_RPS / RATE_LIMIT_BURST enable a per-client token bucket
+(0 disables it, the default).
+"""
+
+import os
+import threading
+import time
+
+CRITICAL = "critical"
+
+_threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+DEFAULT_LIMITS = {
+    CRITICAL: 0,
+    "bulk": max(_threads // 2, 1),
+    "default": max(_threads - 1, 1),
+    "stats": _threads,
+    # Long-lived SSE streams: never enough to take every thread
+    "stream": max(_threads - 2, 1),
+}
+WAIT_SECONDS = float(os.environ.get("ADMISSION_WAIT_MS", "250")) / 1000
+MAX_QUEUE_SECONDS = float(os.environ.get("ADMISSION_MAX_QUEUE_MS", "5000")) / 1000
+RATE_LIMIT_RPS = float(os.environ.get("RATE_LIMIT_RPS", "0"))
+RATE_LIMIT_BURST = float(os.environ.get("RATE_LIMIT_BURST", "0")) or max(RATE_LIMIT_RPS * 2, 1)
+# Forget idle clients once this many buckets are tracked
+MAX_BUCKETS = 10_000
+
+
+class Shed(Exception):
+    """The request was not admitted; reason is "busy", "expired" or "rate"."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _parse_limits(spec):
+    """'bulk=2,default=6' -> {"bulk": 2, "default": 6}; 0 means unlimited."""
+    limits = dict(DEFAULT_LIMITS)
+    for part in spec.split(","):
+        name, _, value = part.partition("=")
+        if name.strip() and value.strip():
+            limits[name.strip()] = int(value)
+    return limits
+
+
+class Limiter:
+    """A counting semaphore that reports how many callers are waiting."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout) -> bool:
+        with self._cond:
+            if self.limit <= 0 or self.active < self.limit:
+                self.active += 1
+                return True
+            self.waiting += 1
+            try:
+                if not self._cond.wait_for(lambda: self.active < self.limit, timeout):
+                    return False
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+
+class TokenBucket:
+    """Per-client token buckets refilled at `rate` tokens per second."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, client) -> float:
+        """
+        Take one token for client.
+        Returns: 0.0 if allowed, otherwise seconds until a token is available
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self._buckets[client] = (tokens - 1, now)
+                return 0.0
+            self._buckets[client] = (tokens, now)
+            if len(self._buckets) > MAX_BUCKETS:
+                self._prune(now)
+            return (1 - tokens) / self.rate
+
+    def _prune(self, now):
+        # Buckets that would be full again carry no state worth keeping
+        full_after = self.burst / self.rate
+        for client, (_, last) in list(self._buckets.items()):
+            if now - last >= full_after:
+                del self._buckets[client]
+
+
+_limiters = {
+    name: Limiter(limit)
+    for name, limit in _parse_limits(os.environ.get("ADMISSION_LIMITS", "")).items()
+}
+_rate_limiter = TokenBucket(RATE_LIMIT_RPS, RATE_LIMIT_BURST) if RATE_LIMIT_RPS > 0 else None
+_counts_lock = threading.Lock()
+_counts = {"admitted": 0, "queued": 0, "shed_busy": 0, "shed_expired": 0, "shed_rate": 0}
+
+
+def _count(key):
+    with _counts_lock:
+        _counts[key] += 1
+
+
+def queued_seconds(request_start):
+    """
+    Seconds since the proxy received the request, from an X-Request-Start
+    value like "t=1712345678.123" (nginx $msec), or None if unknown.
+    """
+    if not request_start:
+        return None
+    try:
+        started = float(request_start.removeprefix("t="))
+    except ValueError:
+        return None
+    return max(time.time() - started, 0.0)
+
+
+def admit(route_class, client, waited=None) -> Limiter:
+    """
+    Admit a request or raise Shed.
+    Parameters: route_class (str), client (str, the rate-limit key), waited
+    (float or None, seconds already spent queued upstream)
+    Returns: the Limiter holding the request's slot; pass it to release()
+    """
+    if route_class != CRITICAL:
+        if waited is not None and waited > MAX_QUEUE_SECONDS:
+            _count("shed_expired")
+            raise Shed("expired", 1)
+        if _rate_limiter is not None:
+            wait = _rate_limiter.take(client)
+            if wait:
+                _count("shed_rate")
+                raise Shed("rate", max(int(wait + 0.999), 1))
+
+    limiter = _limiters.get(route_class) or _limiters["default"]
+    if limiter.limit > 0 and limiter.active >= limiter.limit:
+        _count("queued")
+    if not limiter.acquire(WAIT_SECONDS):
+        _count("shed_busy")
+        raise Shed("busy", 1)
+    _count("admitted")
+    return limiter
+
+
+def release(limiter):
+    limiter.release()
+
+
+def stats() -> dict:
+    """Admission counters plus in-flight and waiting requests per class."""
+    with _counts_lock:
+        result = dict(_counts)
+    for name, limiter in _limiters.items():
+        result[f"{name}_active"] = limiter.active
+        result[f"{name}_waiting"] = limiter.waiting
+        result[f"{name}_limit"] = limiter.limit
+    return result
@@ -1,30 +1,183 @@
+import csv
+import hashlib
+import io
 import json
-from functools import *
-from flask import Flask, jsonify, request
+import os
+import time
+import zlib
+from flask import Blueprint, Flask, Response, current_app, g, jsonify, request
 from flask_cors import CORS
+import psycopg2
 import logging
-import db, error_msg
+import admission, change_feed, course_stats, db, error_msg, group_commit, json_providers, listener, metrics, ranks, validation
+from pool import PoolTimeout
 
-app = Flask(__name__)
-CORS(app)
+bp = Blueprint("students", __name__)
 
 # Instructions:
 # - Use the functions in backend/db.py in your implementation.
 # - You are free to use additional data structures in your solution
 # - You must define and tell your tutor one edge case you have devised and how you have addressed this
 
+MAX_BULK_ROWS = 100_000
+MAX_BATCH_ROWS = 10_000
+COLUMNS_MIMETYPE = "application/vnd.students.columns+json"
+SHARED_MAX_AGE = int(os.environ.get("HTTP_SHARED_MAX_AGE", "1"))
+ETAG_CACHE_CONTROL = f"public, max-age=0, must-revalidate, s-maxage={SHARED_MAX_AGE}"
+# Read-your-writes: epoch seconds until which this client's reads use the primary
+READ_PRIMARY_COOKIE = "db_primary_until"
 
-@app.route("/students")
+
+@bp.route("/students")
 def get_students():
     """
     Route to fetch all students from the database
-    return: Array of student objects
+    param course: Only students in this course (optional, query string)
+    param min_mark, max_mark: Inclusive mark range (optional, query string)
+    param q: Case-insensitive name substring (optional, query string)
+    param sort: One of id, name, course, mark (optional, default id)
+    param order: asc or desc (optional, default asc)
+    param limit: Page size, at most validation.MAX_PAGE_SIZE (optional, query string)
+    param cursor: next_cursor from the previous page (optional, query string)
+    param after_id: Only return students with a larger id, for sort=id (optional)
+    param stream: "ndjson" or "json" to stream every matching student (optional)
+    param format: "columns" (or Accept: application/vnd.students.columns+json) for
+    a column-oriented body {"id": [...], "name": [...], "course": [...], "mark": [...]}
+    return: Array of student objects, or when any of the parameters above is
+    given a page {"students": [...], "next_cursor": str, "next_after_id": id}
     """
+    try:
+        args = validation.parse_list_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    columns = _wants_columns()
+    # Each distinct query string (and wire format) is a different representation
+    etag = _current_etag("students", request.query_string + (b"|columns" if columns else b""))
+    # Weak comparison: nginx downgrades the tag to W/"..." when it gzips the body
+    if request.if_none_match.contains_weak(etag):
+        return _vary_accept(_not_modified(etag))
+    return _vary_accept(_with_etag(_list_students_response(args, columns), etag))
+
+
+def _wants_columns():
+    # Column-oriented format, opted into by query string or Accept header
+    if request.args.get("format") == "columns":
+        return True
+    return request.accept_mimetypes.best == COLUMNS_MIMETYPE
+
+
+def _vary_accept(response):
+    response.vary.add("Accept")
+    return response
+
+
+def _columns_response(payload):
+    response = jsonify(payload)
+    response.mimetype = COLUMNS_MIMETYPE
+    return response
+
+
+def _list_students_response(args, columns=False):
+    stream = request.args.get("stream")
+    query = (args["filters"], args["sort"], args["order"], args["after"])
+    if stream == "ndjson":
+        return Response(_ndjson_chunks(db.iter_students(*query)), mimetype="application/x-ndjson")
+    if stream == "json":
+        return Response(_json_array_chunks(db.iter_students(*query)), mimetype="application/json")
+
+    paginated = any(key in request.args for key in validation.LIST_PARAMS)
+    if columns:
+        # {"id": [...], "name": [...], ...} straight from the row tuples:
+        # no per-row dicts and no repeated keys on the wire
+        table, next_after = db.get_student_columns(
+            *query, limit=args["limit"] if paginated else None
+        )
+        if not paginated:
+            return _columns_response(table)
+        return _columns_response(
+            {
+                "students": table,
+                "next_cursor": validation.encode_cursor(args["sort"], next_after) if next_after else None,
+                "next_after_id": next_after[1] if next_after and args["sort"] == "id" else None,
+            }
+        )
+
+    if not paginated:
+        return jsonify(db.get_all_students())
+
+    students, next_after = db.list_students(*query, limit=args["limit"])
+    return jsonify(
+        {
+            "students": students,
+            "next_cursor": validation.encode_cursor(args["sort"], next_after) if next_after else None,
+            "next_after_id": next_after[1] if next_after and args["sort"] == "id" else None,
+        }
+    )
+
+
+def _ndjson_chunks(students):
+    # One JSON document per line, flushed as the named cursor produces rows
+    for student in students:
+        yield json.dumps(student) + "\n"
+
+
+def _json_array_chunks(students):
+    # Emit a plain JSON array piece by piece so the full list never exists in memory
+    yield "["
+    first = True
+    for student in students:
+        yield ("" if first else ",") + json.dumps(student)
+        first = False
+    yield "]"
+
 
-    return jsonify(db.get_all_students())
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
 
 
-@app.route("/students", methods=["POST"])
+@bp.route("/students/export")
+def export_students():
+    """
+    Route to download every matching student, streamed with constant memory
+    param format: "csv" (default) or "ndjson" (optional, query string)
+    param course, min_mark, max_mark, q, sort, order: As for GET /students (optional)
+    return: A chunked CSV or NDJSON attachment, gzip-encoded when the client accepts it
+    """
+    fmt = request.args.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": error_msg.ERROR_FORMAT}), 400
+    try:
+        args = validation.parse_list_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query = (args["filters"], args["sort"], args["order"])
+    if fmt == "csv":
+        chunks = db.export_students_csv(*query)
+    else:
+        chunks = (line.encode() for line in db.export_students_ndjson(*query))
+
+    gzipped = bool(request.accept_encodings["gzip"])
+    response = Response(_gzip_chunks(chunks) if gzipped else chunks, mimetype=EXPORT_FORMATS[fmt])
+    if gzipped:
+        response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    response.headers["Content-Disposition"] = f"attachment; filename=students.{fmt}"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _gzip_chunks(chunks):
+    # Compress on the fly; zlib emits output whenever its internal buffer fills
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+@bp.route("/students", methods=["POST"])
 def create_student():
     # EDGE CASE: We are FUCKING NOT MAKING STUDENTS OPTIONALLY MARK
     # THEN how THE FUCK ARE YOU SUPPOSED TO CALCULATE MARKS PROPERLY??
@@ -40,31 +193,167 @@ def create_student():
     if not isinstance(student_data, dict):
         return jsonify({"error": error_msg.ERROR_JSON}), 404
 
-    name = student_data.get("name")
-    course = student_data.get("course")
-    mark = student_data.get("mark", None)
-    if mark is None:
-        mark = 0
-
     # EDGE CASE 2: We need to FUCKING CHECK for strings that are WHITESPACE
     # Why THE FUCK WOULD THAT HAPPEN? BUT DO SO
+    # (handled in validation.validate_new_student, shared with /students/bulk)
+    student, error = validation.validate_new_student(student_data)
+    if error is not None:
+        return jsonify({"error": error}), 400
 
-    if not isinstance(name, str) or name.strip() == "":
-        return jsonify({"error": error_msg.ERROR_NAME}), 400
+    # Coalesced with concurrent creates into one commit when DB_GROUP_COMMIT=1
+    student_data = group_commit.insert_student(*student)
+    return jsonify(student_data), 200
 
-    if not isinstance(course, str) or course.strip() == "":
-        return jsonify({"error": error_msg.ERROR_COURSE}), 400
 
-    if not isinstance(mark, int) or mark is None or mark > 100 or mark < 0:
-        return jsonify({"error": error_msg.ERROR_COURSE}), 400
+@bp.route("/students/bulk", methods=["POST"])
+def bulk_create_students():
+    """
+    Route to create many students in one transaction
+    param body: A JSON array of student objects, NDJSON (one object per line,
+    Content-Type application/x-ndjson) or CSV with a name,course,mark header
+    (Content-Type text/csv, or a multipart upload in the "file" field)
+    return: {"inserted": n, "ids": [...], "errors": [{"index": i, "error": msg}]}
+    where index is the 0-based position of the rejected row in the upload;
+    NDJSON errors also carry the 1-based "line", and a line that is not valid
+    JSON is rejected on its own rather than failing the whole upload
+    """
+    try:
+        rows, lines = _parse_bulk_body()
+    except ValueError:
+        return jsonify({"error": error_msg.ERROR_JSON}), 404
 
-    app.logger.info(type(student_data))
+    if len(rows) > MAX_BULK_ROWS:
+        return jsonify({"error": error_msg.ERROR_BULK_SIZE}), 413
 
-    student_data = db.insert_student(name.strip(), course.strip(), mark)
-    return jsonify(student_data), 200
+    valid, errors = validation.validate_new_students(rows)
+    if lines is not None:
+        for error in errors:
+            error["line"] = lines[error["index"]]
+    ids = db.bulk_insert_students([student for _, student in valid])
+    current_app.logger.info(f"Bulk insert: {len(ids)} inserted, {len(errors)} rejected")
+    return jsonify({"inserted": len(ids), "ids": ids, "errors": errors}), 200
+
+
+@bp.route("/students", methods=["PATCH"])
+def batch_update_students():
+    """
+    Route to update many students at once
+    param body: JSON array of {"id": int, "name"?: str, "course"?: str, "mark"?: int}
+    return: {"updated": [students], "not_found": [ids], "errors": [{"index": i, "error": msg}]}
+    """
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        return jsonify({"error": error_msg.ERROR_JSON}), 404
+    if len(items) > MAX_BATCH_ROWS:
+        return jsonify({"error": error_msg.ERROR_BULK_SIZE}), 413
+
+    updates, errors = validation.validate_batch_update(items)
+    updated, not_found = db.batch_update_students(updates)
+    current_app.logger.info(f"Batch update: {len(updated)} updated, {len(not_found)} not found")
+    return jsonify({"updated": updated, "not_found": not_found, "errors": errors}), 200
+
+
+@bp.route("/students", methods=["DELETE"])
+def batch_delete_students():
+    """
+    Route to delete many students at once
+    param ids: JSON array of student ids to delete (from request body), or
+    param course: Delete every student in this course (from request body)
+    return: {"deleted": [students], "not_found": [ids]}
+    """
+    body = request.get_json(silent=True)
+    if isinstance(body, list):
+        body = {"ids": body}
+    if not isinstance(body, dict):
+        return jsonify({"error": error_msg.ERROR_JSON}), 404
+
+    ids = body.get("ids")
+    course = body.get("course")
+    # Exactly one selector, so an empty or malformed body can never wipe the table
+    if (ids is None) == (course is None):
+        return jsonify({"error": error_msg.ERROR_BATCH_FILTER}), 400
+    if ids is not None:
+        if not isinstance(ids, list) or not all(
+            isinstance(i, int) and not isinstance(i, bool) for i in ids
+        ):
+            return jsonify({"error": error_msg.ERROR_ID}), 400
+        if len(ids) > MAX_BATCH_ROWS:
+            return jsonify({"error": error_msg.ERROR_BULK_SIZE}), 413
+        deleted, not_found = db.delete_students(ids=list(dict.fromkeys(ids)))
+    else:
+        if not isinstance(course, str) or course.strip() == "":
+            return jsonify({"error": error_msg.ERROR_COURSE}), 400
+        deleted, not_found = db.delete_students(course=course.strip())
+
+    current_app.logger.info(f"Batch delete: {len(deleted)} deleted")
+    return jsonify({"deleted": deleted, "not_found": not_found}), 200
+
+
+def _parse_bulk_body():
+    """
+    Decode a bulk upload into a list of row dicts.
+    Returns: (rows, lines) where lines gives the 1-based line number of each
+    row for NDJSON and is None otherwise; an NDJSON line that is not valid
+    JSON becomes a None row, which validation rejects
+    Raises ValueError if the body is not a JSON array, NDJSON or CSV.
+    """
+    upload = request.files.get("file")
+    if upload is not None:
+        text = upload.read().decode("utf-8-sig")
+        mimetype = upload.mimetype
+        if not mimetype or mimetype == "application/octet-stream":
+            mimetype = "text/csv" if (upload.filename or "").endswith(".csv") else "application/json"
+    else:
+        text = request.get_data(as_text=True)
+        mimetype = request.mimetype
+
+    if mimetype in ("application/x-ndjson", "application/jsonl"):
+        rows, lines = [], []
+        for number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                rows.append(None)
+            lines.append(number)
+        return rows, lines
+
+    if mimetype in ("text/csv", "application/csv"):
+        rows = []
+        for row in csv.DictReader(io.StringIO(text)):
+            # CSV has no types; marks arrive as strings and blank means "no mark"
+            mark = (row.get("mark") or "").strip()
+            if mark == "":
+                row["mark"] = None
+            else:
+                try:
+                    row["mark"] = int(mark)
+                except ValueError:
+                    # Left as text, so validation rejects just this row
+                    pass
+            rows.append(row)
+        return rows, None
+
+    rows = json.loads(text)
+    if not isinstance(rows, list):
+        raise ValueError("expected a JSON array")
+    return rows, None
+
+
+@bp.route("/students/<int:student_id>")
+def get_student(student_id):
+    """
+    Route to fetch one student by id
+    return: The student object, 404 if there is no student with that id
+    """
+    student = db.get_student_by_id(student_id)
+    if student is None:
+        return jsonify({"error": error_msg.ERROR_ID}), 404
+    return jsonify(student), 200
 
 
-@app.route("/students/<int:student_id>", methods=["PUT"])
+@bp.route("/students/<int:student_id>", methods=["PUT"])
 def update_student(student_id):
     """
     Route to update student details by id
@@ -74,13 +363,7 @@ def update_student(student_id):
     return: The updated student if successful
     """
     if student_id is None:
-        app.logger.info(error_msg.ERROR_ID)
-        return jsonify({"error": error_msg.ERROR_ID}), 404
-
-    student = db.get_student_by_id(student_id)
-
-    if student is None:
-        app.logger.info(error_msg.ERROR_ID)
+        current_app.logger.info(error_msg.ERROR_ID)
         return jsonify({"error": error_msg.ERROR_ID}), 404
 
     student_data = request.get_json(silent=True)
@@ -88,74 +371,406 @@ def update_student(student_id):
         return jsonify({"error": error_msg.ERROR_JSON}), 404
 
     # Allow partial updates: only validate fields provided.
-    name = student_data.get("name", None)
-    course = student_data.get("course", None)
-    mark = student_data.get("mark", None)
-
-    if not isinstance(name, str) or name.strip() == "":
-        return jsonify({"error": error_msg.ERROR_NAME}), 400
-
-    if not isinstance(course, str) or course.strip() == "":
-        return jsonify({"error": error_msg.ERROR_COURSE}), 400
-
-    # if not isinstance(mark, int) or mark is None or mark > 100 or mark < 0:
-    #     return jsonify({"error": error_msg.ERROR_MARK}), 400
-    # TODO: decide if we should make mark zero!
-    if not isinstance(mark, int) or mark is None or mark > 100 or mark < 0:
-        mark = 0
-    student_data = db.update_student(student_id, name, course, mark)
-    return jsonify(student_data), 200
+    # Missing fields are left untouched by db.update_student (COALESCE).
+    changes, error = validation.validate_student_update(student_data)
+    if error is not None:
+        return jsonify({"error": error}), 400
+
+    # Single UPDATE ... RETURNING: an empty result means the id does not exist,
+    # so there is no separate lookup racing against concurrent writers.
+    student = db.update_student(student_id, *changes)
+    if student is None:
+        current_app.logger.info(error_msg.ERROR_ID)
+        return jsonify({"error": error_msg.ERROR_ID}), 404
+    return jsonify(student), 200
 
 
-@app.route("/students/<int:student_id>", methods=["DELETE"])
+@bp.route("/students/<int:student_id>", methods=["DELETE"])
 def delete_student(student_id):
     """
     Route to delete student by id
     return: The deleted student
     """
-    student = db.get_student_by_id(student_id)
+    student = db.delete_student(student_id)
     if student is None:
-        app.logger.info(error_msg.ERROR_ID)
+        current_app.logger.info(error_msg.ERROR_ID)
         return jsonify({"error": error_msg.ERROR_ID}), 404
 
-    app.logger.info(f"Student with id: {student_id} delete")
-    db.delete_student(student_id)
+    current_app.logger.info(f"Student with id: {student_id} delete")
     return jsonify(student), 200
 
 
-@app.route("/stats")
+@bp.route("/students/<int:student_id>/history")
+def get_student_history(student_id):
+    """
+    Route to show every recorded change to one student, oldest first
+    return: {"id": id, "history": [{"op", "name", "course", "mark", "changed_at"}]},
+    404 if the id has no history
+    """
+    history = db.get_student_history(student_id)
+    if not history:
+        return jsonify({"error": error_msg.ERROR_ID}), 404
+    return jsonify({"id": student_id, "history": history}), 200
+
+
+@bp.route("/students/changes")
+def student_changes():
+    """
+    Route streaming live changes to the students table as Server-Sent Events
+    event change: {"op": "insert" | "update" | "delete", "id": id, "student": student or null}
+    event stats: The same object as GET /stats, sent on connect and after each burst of changes
+    event resync: Deltas may have been missed; reload the table
+    return: A text/event-stream response, 503 when this worker has no free stream
+    slots, 404 when the feed is switched off (SSE_ENABLED)
+    """
+    if not change_feed.ENABLED:
+        return jsonify({"error": error_msg.ERROR_FEED_DISABLED}), 404
+    try:
+        subscription = change_feed.subscribe()
+    except change_feed.TooManyClients:
+        response = jsonify({"error": error_msg.ERROR_BUSY})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(change_feed.RETRY_MS // 1000)
+        return response
+
+    response = Response(change_feed.stream(subscription), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Tell nginx-style proxies not to buffer the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@bp.route("/stats")
 def get_stats():
     """
     Route to show the stats of all student marks
+    param as_of: ISO 8601 timestamp; stats as they were at that time (optional, query string)
     return: An object with the stats (count, average, min, max)
     """
     # NOTE: You cant have a student with no fucking marks we made this precondition clear
     # above
-    all_students = db.get_all_students()
-    if len(all_students) == 0:
-        return {}, 200
+    if "as_of" in request.args:
+        try:
+            as_of = validation.parse_timestamp(request.args["as_of"])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        stats = db.get_stats_as_of(as_of)
+        if stats is None:
+            return jsonify({}), 200
+        return jsonify(
+            {
+                "count": stats["count"],
+                "average": stats["sum"] / stats["count"],
+                "min": stats["min"],
+                "max": stats["max"],
+            }
+        ), 200
+
+    etag = _current_etag("stats")
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
+
+    stats = db.get_stats()
+    if stats is None:
+        return _with_etag(jsonify({}), etag)
+
+    avg = stats["sum"] / stats["count"]
+
+    return _with_etag(
+        jsonify(
+            {
+                "count": stats["count"],
+                "average": avg,
+                "min": stats["min"],
+                "max": stats["max"],
+            }
+        ),
+        etag,
+    )
+
+
+def _current_etag(resource, variant=b""):
+    """
+    Strong ETag for a resource at the current students data version.
+    The version is read before any data so a write landing in between can only
+    make the tag older than the body, never newer.
+    """
+    tag = f"{resource}-{db.get_data_version()}"
+    if variant:
+        tag += "-" + hashlib.sha1(variant).hexdigest()[:12]
+    return tag
+
+
+def _not_modified(etag):
+    response = Response(status=304)
+    return _with_etag(response, etag)
 
-    marks: list[int] = [x["mark"] for x in all_students]
-    num_students = len(marks)
-    sum_mark = reduce(lambda a, b: a + b, marks)
-    avg = sum_mark / num_students
-    maxMark = max(marks)
-    minMark = min(marks)
 
+def _with_etag(response, etag):
+    response.set_etag(etag)
+    # Browsers keep the body but check back with If-None-Match every time;
+    # shared caches (the nginx front tier) may serve it for SHARED_MAX_AGE
+    response.headers["Cache-Control"] = ETAG_CACHE_CONTROL
+    return response
+
+
+@bp.route("/stats/courses")
+def get_course_stats():
+    """
+    Route to show the mark distribution of every course
+    return: Array of per-course stats (count, mean, median, p25, p75, p90,
+    stddev, min, max, histogram)
+    """
+    return jsonify(course_stats.get_all()), 200
+
+
+@bp.route("/stats/courses/<course>")
+def get_one_course_stats(course):
+    """
+    Route to show the mark distribution of a single course
+    return: The course stats object, 404 if no student in the course has a mark
+    """
+    stats = course_stats.get(course.strip())
+    if stats is None:
+        return jsonify({"error": error_msg.ERROR_COURSE_NOT_FOUND}), 404
+    return jsonify(stats), 200
+
+
+@bp.route("/courses/<course>/leaderboard")
+def get_course_leaderboard(course):
+    """
+    Route to show the best marks in a course
+    param limit: How many ranked students to return, at most 100 (optional, default 10)
+    return: {"course": course, "students": [{id, name, course, mark, rank, course_size}]},
+    404 if no student in the course has a mark. Ranks trail writes by about a second.
+    """
+    try:
+        limit = validation.parse_leaderboard_limit(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    course = course.strip()
+    students = db.get_course_leaderboard(course, limit)
+    if not students:
+        return jsonify({"error": error_msg.ERROR_COURSE_NOT_FOUND}), 404
+    return jsonify({"course": course, "students": students}), 200
+
+
+@bp.route("/students/<int:student_id>/rank")
+def get_student_rank(student_id):
+    """
+    Route to show a student's rank within their course
+    return: {id, name, course, mark, rank, course_size}, 404 if the student is not ranked
+    """
+    ranked = db.get_student_rank(student_id)
+    if ranked is None:
+        return jsonify({"error": error_msg.ERROR_ID}), 404
+    return jsonify(ranked), 200
+
+
+@bp.route("/")
+def health():
+    """Health check."""
+    return {"status": "ok"}
+
+
+@bp.route("/health/pool")
+def pool_health():
+    """
+    Route to show the database connection pool metrics for this worker
+    return: An object with pool size, wait and checkout timings
+    """
+    return jsonify(db.pool_stats()), 200
+
+
+@bp.route("/health/cache")
+def cache_health():
+    """
+    Route to show the in-process cache counters for this worker
+    return: An object with hits, misses and evictions per cache
+    """
     return (
         jsonify(
-            {"count": num_students, "average": avg, "min": minMark, "max": maxMark}
+            {
+                "students": db.student_cache_stats(),
+                "course_stats": course_stats.cache_stats(),
+                "listener_running": listener.running(),
+            }
         ),
         200,
     )
 
 
-@app.route("/")
-def health():
-    """Health check."""
-    return {"status": "ok"}
+@bp.route("/metrics")
+def get_metrics():
+    """
+    Route to expose request, query, pool and cache metrics for this worker
+    return: Prometheus text exposition format
+    """
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@bp.before_app_request
+def start_timer():
+    g.request_started = time.perf_counter()
+    g.timing = metrics.start_request()
+
+
+@bp.before_app_request
+def route_reads():
+    # Clients that wrote recently carry a cookie keeping their reads on the primary
+    try:
+        g.primary_until = float(request.cookies.get(READ_PRIMARY_COOKIE, "0"))
+    except ValueError:
+        g.primary_until = 0.0
+    db.begin_request(g.primary_until)
+
+
+# Never admission-limited, so health checks stay fast under load; none of
+# them touches the database
+CRITICAL_ROUTES = {"/", "/health/pool", "/health/cache", "/metrics"}
+# Behind nginx the client address is the last X-Forwarded-For entry (the one
+# nginx appended; earlier entries are whatever the client sent)
+TRUST_PROXY = os.environ.get("ADMISSION_TRUST_PROXY", "0") == "1"
+
+
+def _route_class():
+    # Admission class of the current request (see admission.py)
+    rule = request.url_rule.rule if request.url_rule else None
+    if rule in CRITICAL_ROUTES:
+        return admission.CRITICAL
+    if rule == "/stats" and "as_of" not in request.args:
+        # Reads the database, so it is limited, just less tightly than the rest
+        return "stats"
+    if rule == "/students/changes":
+        # Streams hold a thread for minutes, so they get their own small class
+        return "stream"
+    if rule in ("/students/export", "/students/bulk"):
+        return "bulk"
+    if rule == "/students" and request.method in ("PATCH", "DELETE"):
+        return "bulk"
+    if rule == "/students" and request.method == "GET":
+        paginated = any(key in request.args for key in validation.LIST_PARAMS)
+        if not paginated or "stream" in request.args:
+            return "bulk"
+    return "default"
+
+
+@bp.before_app_request
+def admit_request():
+    route_class = _route_class()
+    client = request.access_route[-1] if TRUST_PROXY else request.remote_addr
+    waited = admission.queued_seconds(request.headers.get("X-Request-Start"))
+    try:
+        g.admission = admission.admit(route_class, client, waited)
+    except admission.Shed as e:
+        response = jsonify({"error": error_msg.ERROR_RATE if e.reason == "rate" else error_msg.ERROR_BUSY})
+        response.status_code = 429 if e.reason == "rate" else 503
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response
+    return None
+
+
+@bp.after_app_request
+def release_admission(response):
+    limiter = g.pop("admission", None)
+    if limiter is not None:
+        if response.is_streamed:
+            # The body is produced after this hook; hold the slot until it is sent
+            response.call_on_close(lambda: admission.release(limiter))
+        else:
+            admission.release(limiter)
+    return response
+
+
+@bp.teardown_app_request
+def release_admission_on_error(exc):
+    # after_request hooks are skipped when a view raises
+    limiter = g.pop("admission", None)
+    if limiter is not None:
+        admission.release(limiter)
+
+
+@bp.after_app_request
+def stick_to_primary(response):
+    until = db.primary_until()
+    if db.replica_hosts() and until > g.get("primary_until", 0.0):
+        response.set_cookie(
+            READ_PRIMARY_COOKIE,
+            f"{until:.3f}",
+            max_age=max(int(until - time.time()) + 1, 1),
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
+
+
+@bp.after_app_request
+def record_timing(response):
+    started = g.get("request_started")
+    if started is None:
+        return response
+    total = time.perf_counter() - started
+    timing = g.timing
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    metrics.http_request_seconds.observe(total, route, request.method, response.status_code)
+    if not response.is_streamed and response.content_length is not None:
+        metrics.http_response_bytes.observe(response.content_length, route)
+    # Streamed bodies are produced after this point, so only db time spent
+    # before the response started is included for them
+    app_time = max(total - timing.db - timing.serialize, 0.0)
+    response.headers["Server-Timing"] = (
+        f"db;dur={timing.db * 1000:.2f}, serialize;dur={timing.serialize * 1000:.2f}, "
+        f"app;dur={app_time * 1000:.2f}, total;dur={total * 1000:.2f}"
+    )
+    return response
 
 
-if __name__ == "__main__":
+metrics.Gauges("db_pool", "Database connection pool", lambda: db.pool_stats())
+metrics.Gauges("student_cache", "get_student_by_id cache", lambda: db.student_cache_stats())
+metrics.Gauges("course_stats_cache", "Per-course stats cache", lambda: course_stats.cache_stats())
+metrics.Gauges("change_feed", "Server-Sent Events change feed", lambda: change_feed.stats())
+metrics.Gauges("group_commit", "POST /students group commit", lambda: group_commit.stats())
+metrics.Gauges("student_ranks", "student_ranks view refreshes", lambda: ranks.stats())
+metrics.Gauges("admission", "Admission control: admitted, queued and shed requests", lambda: admission.stats())
+
+
+@bp.app_errorhandler(psycopg2.IntegrityError)
+def constraint_violation(e):
+    # The schema (migrations/0004) enforces the same rules as validation.py,
+    # so anything that slips past the route checks is still rejected here
+    current_app.logger.info(f"Constraint violation: {e.diag.constraint_name}")
+    return jsonify({"error": error_msg.ERROR_CONSTRAINT}), 400
+
+
+@bp.app_errorhandler(PoolTimeout)
+def pool_exhausted(e):
+    current_app.logger.warning(str(e))
+    return jsonify({"error": error_msg.ERROR_BUSY}), 503
+
+
+def create_app():
+    """
+    App factory. Gunicorn calls this once per worker process (see
+    gunicorn.conf.py), so per-process state such as the db connection pool
+    is only ever created after the worker has forked. Under gunicorn the
+    master has already applied the migrations; other servers (e.g. the
+    development server below) apply them here.
+    return: The configured Flask app
+    """
+    app = Flask(__name__)
+    app.json = json_providers.provider_class()(app)
+    CORS(app, expose_headers=["ETag", "Server-Timing"])
+    app.register_blueprint(bp)
     app.logger.setLevel(logging.INFO)
-    app.run(host="0.0.0.0", port=5000)
+    if os.environ.get("DB_MIGRATE_ON_START", "1") == "1":
+        applied = db.run_migrations(float(os.environ.get("DB_STARTUP_TIMEOUT", "30")))
+        if applied:
+            app.logger.info(f"Applied schema migrations: {applied}")
+    if os.environ.get("DB_CACHE_NOTIFY", "0") == "1":
+        listener.start(db.connection_params())
+    return app
+
+
+if __name__ == "__main__":
+    # Development server only; the container runs gunicorn instead
+    create_app().run(host="0.0.0.0", port=5000)
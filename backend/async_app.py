@@ -0,0 +1,219 @@
+"""
+Async flavour of the backend API (Quart + asyncpg).
+
+Serves the same routes and JSON contracts as app.py for the endpoints that
+automark checks (/, /students, /students/<id> and /stats), sharing request
+validation with app.py through validation.py. One process can keep thousands
+of requests in flight while they wait on the database.
+
+Run with: hypercorn -b 0.0.0.0:5000 -w 2 "async_app:create_app()"
+(or `docker compose --profile async up backend-async`)
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+
+from quart import Blueprint, Quart, Response, current_app, jsonify, request
+from quart_cors import cors
+
+import async_db
+import db
+import error_msg
+import validation
+
+bp = Blueprint("students", __name__)
+
+# Same caching policy as app.py: revalidate in browsers, micro-cache in nginx
+SHARED_MAX_AGE = int(os.environ.get("HTTP_SHARED_MAX_AGE", "1"))
+ETAG_CACHE_CONTROL = f"public, max-age=0, must-revalidate, s-maxage={SHARED_MAX_AGE}"
+
+
+@bp.route("/students")
+async def get_students():
+    """
+    Route to fetch all students from the database
+    Accepts the same filter, sort and paging parameters as app.get_students
+    (streaming is only available on the sync app).
+    return: Array of student objects, or a page {"students": [...], "next_cursor": str,
+    "next_after_id": id} when any list parameter is given
+    """
+    try:
+        args = validation.parse_list_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    etag = await _current_etag("students", request.query_string)
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
+
+    if not any(key in request.args for key in validation.LIST_PARAMS):
+        return _with_etag(jsonify(await async_db.get_all_students()), etag)
+
+    students, next_after = await async_db.list_students(
+        args["filters"], args["sort"], args["order"], args["after"], limit=args["limit"]
+    )
+    return _with_etag(
+        jsonify(
+            {
+                "students": students,
+                "next_cursor": validation.encode_cursor(args["sort"], next_after) if next_after else None,
+                "next_after_id": next_after[1] if next_after and args["sort"] == "id" else None,
+            }
+        ),
+        etag,
+    )
+
+
+@bp.route("/students", methods=["POST"])
+async def create_student():
+    """
+    Route to create a new student
+    param name, course, mark: Student fields (from request body)
+    return: The created student if successful
+    """
+    student_data = await request.get_json(silent=True)
+    if not isinstance(student_data, dict):
+        return jsonify({"error": error_msg.ERROR_JSON}), 404
+
+    student, error = validation.validate_new_student(student_data)
+    if error is not None:
+        return jsonify({"error": error}), 400
+
+    return jsonify(await async_db.insert_student(*student)), 200
+
+
+@bp.route("/students/<int:student_id>")
+async def get_student(student_id):
+    """
+    Route to fetch one student by id
+    return: The student object, 404 if there is no student with that id
+    """
+    student = await async_db.get_student_by_id(student_id)
+    if student is None:
+        return jsonify({"error": error_msg.ERROR_ID}), 404
+    return jsonify(student), 200
+
+
+@bp.route("/students/<int:student_id>", methods=["PUT"])
+async def update_student(student_id):
+    """
+    Route to update student details by id (partial updates allowed)
+    return: The updated student if successful
+    """
+    student_data = await request.get_json(silent=True)
+    if not isinstance(student_data, dict):
+        return jsonify({"error": error_msg.ERROR_JSON}), 404
+
+    changes, error = validation.validate_student_update(student_data)
+    if error is not None:
+        return jsonify({"error": error}), 400
+
+    student = await async_db.update_student(student_id, *changes)
+    if student is None:
+        current_app.logger.info(error_msg.ERROR_ID)
+        return jsonify({"error": error_msg.ERROR_ID}), 404
+    return jsonify(student), 200
+
+
+@bp.route("/students/<int:student_id>", methods=["DELETE"])
+async def delete_student(student_id):
+    """
+    Route to delete student by id
+    return: The deleted student
+    """
+    student = await async_db.delete_student(student_id)
+    if student is None:
+        current_app.logger.info(error_msg.ERROR_ID)
+        return jsonify({"error": error_msg.ERROR_ID}), 404
+    return jsonify(student), 200
+
+
+@bp.route("/stats")
+async def get_stats():
+    """
+    Route to show the stats of all student marks
+    return: An object with the stats (count, average, min, max)
+    """
+    etag = await _current_etag("stats")
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
+
+    stats = await async_db.get_stats()
+    if stats is None:
+        return _with_etag(jsonify({}), etag)
+
+    return _with_etag(
+        jsonify(
+            {
+                "count": stats["count"],
+                "average": stats["sum"] / stats["count"],
+                "min": stats["min"],
+                "max": stats["max"],
+            }
+        ),
+        etag,
+    )
+
+
+@bp.route("/")
+async def health():
+    """Health check."""
+    return {"status": "ok"}
+
+
+@bp.route("/health/pool")
+async def pool_health():
+    """
+    Route to show the asyncpg pool size for this worker
+    """
+    return jsonify(async_db.pool_stats()), 200
+
+
+async def _current_etag(resource, variant=b""):
+    # Same tag format as app._current_etag, so caches can switch between variants
+    tag = f"{resource}-{await async_db.get_data_version()}"
+    if variant:
+        tag += "-" + hashlib.sha1(variant).hexdigest()[:12]
+    return tag
+
+
+def _not_modified(etag):
+    return _with_etag(Response("", status=304), etag)
+
+
+def _with_etag(response, etag):
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = ETAG_CACHE_CONTROL
+    return response
+
+
+def create_app():
+    """
+    App factory for hypercorn; the asyncpg pool is opened per worker on startup.
+    return: The configured Quart app
+    """
+    app = cors(Quart(__name__), allow_origin="*")
+    app.register_blueprint(bp)
+    app.logger.setLevel(logging.INFO)
+
+    @app.before_serving
+    async def startup():
+        if os.environ.get("DB_MIGRATE_ON_START", "1") == "1":
+            # Migrations are shared with the sync app; run them off the event loop
+            await asyncio.to_thread(
+                db.run_migrations, float(os.environ.get("DB_STARTUP_TIMEOUT", "30"))
+            )
+            db.close_pool()
+        await async_db.open_pool()
+
+    @app.after_serving
+    async def shutdown():
+        await async_db.close_pool()
+
+    return app
+
+
+if __name__ == "__main__":
+    create_app().run(host="0.0.0.0", port=5000)
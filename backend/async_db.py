@@ -0,0 +1,107 @@
+"""
+Async counterpart of db.py for async_app.py, built on asyncpg.
+
+Same functions, arguments and return values as db.py, but every call is a
+coroutine and connections come from an asyncpg pool, so a slow query only
+suspends the request waiting on it instead of blocking a worker thread.
+SQL is shared with db.py through queries.py.
+"""
+
+import os
+
+import asyncpg
+
+import queries
+
+_pool = None
+
+
+def _student(row):
+    return {"id": row[0], "name": row[1], "course": row[2], "mark": row[3]}
+
+
+async def open_pool():
+    """
+    Create the process-wide asyncpg pool. Sized by DB_POOL_MIN / DB_POOL_MAX
+    like the sync pool; call once from the app's startup hook.
+    """
+    global _pool
+    _pool = await asyncpg.create_pool(
+        host=os.environ["DB_HOST"],
+        database=os.environ["DB_NAME"],
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASSWORD"],
+        min_size=int(os.environ.get("DB_POOL_MIN", "1")),
+        max_size=int(os.environ.get("DB_POOL_MAX", "10")),
+        timeout=float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+    )
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def pool_stats() -> dict:
+    return {
+        "size": _pool.get_size(),
+        "idle": _pool.get_idle_size(),
+        "minconn": _pool.get_min_size(),
+        "maxconn": _pool.get_max_size(),
+    }
+
+
+async def get_all_students() -> list[dict]:
+    rows = await _pool.fetch("SELECT id, name, course, mark FROM students ORDER BY id;")
+    return [_student(r) for r in rows]
+
+
+async def list_students(filters=None, sort="id", order="asc", after=None, limit=100):
+    """
+    Fetch one page of students (keyset pagination); see db.list_students.
+    Returns: (list of student dicts, (sort value, id) cursor or None)
+    """
+    sql, params = queries.student_query(filters, sort, order, after)
+    rows = await _pool.fetch(queries.numbered(sql + " LIMIT %s;"), *params, limit + 1)
+    students = [_student(r) for r in rows[:limit]]
+    next_after = None
+    if len(rows) > limit:
+        last = students[-1]
+        next_after = (last[sort], last["id"])
+    return students, next_after
+
+
+async def get_student_by_id(student_id: int):
+    row = await _pool.fetchrow(queries.numbered(queries.SELECT_STUDENT), student_id)
+    return _student(row) if row else None
+
+
+async def insert_student(name, course, mark):
+    row = await _pool.fetchrow(queries.numbered(queries.INSERT_STUDENT), name, course, mark)
+    return _student(row)
+
+
+async def update_student(student_id, name=None, course=None, mark=None):
+    row = await _pool.fetchrow(
+        queries.numbered(queries.UPDATE_STUDENT), name, course, mark, student_id
+    )
+    return _student(row) if row else None
+
+
+async def delete_student(student_id):
+    row = await _pool.fetchrow(queries.numbered(queries.DELETE_STUDENT), student_id)
+    return _student(row) if row else None
+
+
+async def get_data_version() -> int:
+    version = await _pool.fetchval(queries.DATA_VERSION)
+    return version or 0
+
+
+async def get_stats():
+    row = await _pool.fetchrow(queries.STATS)
+    if not row or not row[0]:
+        return None
+    return {"count": int(row[0]), "sum": int(row[1]), "min": row[2], "max": row[3]}
@@ -0,0 +1,182 @@
+"""
+Live change feed behind GET /students/changes (Server-Sent Events).
+
+listener.py delivers every committed insert, update and delete, from any
+worker, as a NOTIFY payload. One fan-out thread per process turns those into
+deltas (the student as it is now, or just the id for deletes) followed by the
+fresh stats aggregate, and pushes the encoded events onto each connected
+client's queue. A burst of writes shares one query for its rows and one stats
+read, whatever the number of clients; a burst larger than SSE_MAX_DELTAS is
+sent as a single resync without reading any rows.
+
+Each open stream holds a gunicorn thread, so streams per worker are capped
+below the thread count (SSE_MAX_CLIENTS, default GUNICORN_THREADS - 2, also
+enforced by the "stream" admission class) and closed after
+SSE_STREAM_SECONDS; EventSource clients reconnect on their own.
+
+The feed is off unless SSE_ENABLED=1, since it needs every write to send a
+change notification (see db.NOTIFY_CHANGES).
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import db
+import listener
+
+ENABLED = os.environ.get("SSE_ENABLED", "0") == "1"
+# Always leave at least two threads per worker for ordinary requests
+MAX_CLIENTS = int(
+    os.environ.get("SSE_MAX_CLIENTS", max(int(os.environ.get("GUNICORN_THREADS", "4")) - 2, 1))
+)
+STREAM_SECONDS = float(os.environ.get("SSE_STREAM_SECONDS", "300"))
+HEARTBEAT_SECONDS = 15.0
+# Client reconnect delay sent in the stream's retry: field
+RETRY_MS = 2000
+CLIENT_QUEUE_SIZE = 256
+# Bigger bursts (bulk imports, batch updates) make clients reload instead
+MAX_DELTAS = int(os.environ.get("SSE_MAX_DELTAS", "200"))
+
+logger = logging.getLogger(__name__)
+
+_pending = queue.Queue()
+_clients = set()
+_lock = threading.Lock()
+_thread = None
+_thread_pid = None
+
+
+class TooManyClients(Exception):
+    """Raised by subscribe() when this worker already serves MAX_CLIENTS streams."""
+
+
+class Subscription:
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        # Set when the client fell too far behind and events were dropped
+        self.overflowed = False
+
+    def push(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.overflowed = True
+
+
+def stats_payload() -> dict:
+    """The current mark stats in the same shape as GET /stats."""
+    stats = db.get_stats()
+    if stats is None:
+        return {}
+    return {
+        "count": stats["count"],
+        "average": stats["sum"] / stats["count"],
+        "min": stats["min"],
+        "max": stats["max"],
+    }
+
+
+def format_event(event, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def subscribe() -> Subscription:
+    """
+    Register a new stream client, starting the change listener and fan-out
+    thread for this process if needed.
+    Raises: TooManyClients
+    """
+    global _thread, _thread_pid
+    with _lock:
+        if len(_clients) >= MAX_CLIENTS:
+            raise TooManyClients()
+        if _thread is None or not _thread.is_alive() or _thread_pid != os.getpid():
+            _thread = threading.Thread(target=_run, name="change-feed", daemon=True)
+            _thread_pid = os.getpid()
+            _thread.start()
+        subscription = Subscription()
+        _clients.add(subscription)
+    listener.start(db.connection_params())
+    return subscription
+
+
+def unsubscribe(subscription):
+    with _lock:
+        _clients.discard(subscription)
+
+
+def stream(subscription):
+    """
+    Generator of SSE text for one client: the current stats, then every
+    change as it happens, with heartbeats so idle proxies keep the connection.
+    Unsubscribes when the client goes away or the stream reaches its lifetime.
+    """
+    try:
+        yield f"retry: {RETRY_MS}\n\n" + format_event("stats", stats_payload())
+        deadline = time.monotonic() + STREAM_SECONDS
+        while time.monotonic() < deadline:
+            if subscription.overflowed:
+                # Deltas were dropped; tell the client to reload instead
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.overflowed = False
+                yield format_event("resync", {})
+                continue
+            try:
+                yield subscription.queue.get(timeout=HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+    finally:
+        unsubscribe(subscription)
+
+
+def stats() -> dict:
+    with _lock:
+        return {"clients": len(_clients), "max_clients": MAX_CLIENTS, "pending": _pending.qsize()}
+
+
+def _on_change_notification(payload):
+    # Runs on the listener thread: just hand over, the db reads happen in _run
+    if _clients:
+        _pending.put(payload)
+
+
+def _events_for(payloads):
+    if len(payloads) > MAX_DELTAS or any(payload.get("op") == "resync" for payload in payloads):
+        return [format_event("resync", {}), format_event("stats", stats_payload())]
+    ids = {payload["id"] for payload in payloads if payload.get("op") != "delete"}
+    students = db.get_students_by_ids(ids) if ids else {}
+    messages = []
+    for payload in payloads:
+        op = payload.get("op")
+        student = None if op == "delete" else students.get(payload["id"])
+        messages.append(format_event("change", {"op": op, "id": payload["id"], "student": student}))
+    messages.append(format_event("stats", stats_payload()))
+    return messages
+
+
+def _run():
+    while True:
+        payloads = [_pending.get()]
+        while True:
+            try:
+                payloads.append(_pending.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            messages = _events_for(payloads)
+        except Exception:
+            logger.exception("Failed to build change feed events")
+            messages = [format_event("resync", {})]
+        with _lock:
+            clients = list(_clients)
+        for subscription in clients:
+            for message in messages:
+                subscription.push(message)
+
+
+listener.subscribe(_on_change_notification)
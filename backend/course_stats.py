@@ -0,0 +1,86 @@
+"""
+Cached per-course statistics.
+
+Results of db.get_course_stats are kept in an in-process TTLCache. Writes made
+through db.py in this process drop the entries for the affected course(s)
+straight away. Writes from other workers do the same when the change listener
+is running (DB_CACHE_NOTIFY=1), and are otherwise picked up when the entry
+expires (STATS_CACHE_TTL seconds). As with the student cache in db.py, a
+read only fills the cache if no invalidation happened while it was in flight.
+"""
+
+import os
+
+import db
+import listener
+from cache import MISSING, TTLCache
+
+# Key under which the all-courses listing is cached
+_ALL = ("__all__",)
+
+_cache = TTLCache(
+    maxsize=int(os.environ.get("STATS_CACHE_SIZE", "512")),
+    ttl=float(os.environ.get("STATS_CACHE_TTL", "30")),
+)
+# Bumped on every invalidation, so a slow read cannot put back stale stats
+_generation = 0
+
+
+def get_all() -> list[dict]:
+    """
+    Stats for every course.
+    Returns: list of per-course stats dicts (see db.get_course_stats)
+    """
+    stats = _cache.get(_ALL)
+    if stats is MISSING:
+        generation = _generation
+        stats = db.get_course_stats()
+        if generation == _generation:
+            _cache.set(_ALL, stats)
+    return stats
+
+
+def get(course):
+    """
+    Stats for one course.
+    Returns: stats dict, or None if the course has no marked students
+    """
+    stats = _cache.get(course)
+    if stats is MISSING:
+        generation = _generation
+        found = db.get_course_stats(course)
+        stats = found[0] if found else None
+        if generation == _generation:
+            _cache.set(course, stats)
+    return stats
+
+
+def invalidate(*courses):
+    """Drop cached stats for the given courses and the all-courses listing."""
+    global _generation
+    _generation += 1
+    for course in courses:
+        if course is not None:
+            _cache.invalidate(course)
+    _cache.invalidate(_ALL)
+
+
+def cache_stats() -> dict:
+    return _cache.stats()
+
+
+def _on_write(op, student, previous):
+    invalidate(student["course"], previous["course"] if previous else None)
+
+
+def _on_change_notification(payload):
+    global _generation
+    if payload.get("op") == "resync":
+        _generation += 1
+        _cache.clear()
+    else:
+        invalidate(payload.get("course"), payload.get("old_course"))
+
+
+db.add_write_listener(_on_write)
+listener.subscribe(_on_change_notification)
@@ -3,116 +3,814 @@ Database module - do not modify. All storage is handled here.
 Your app.py should use these functions only; you will not write any SQL.
 
 Each student is a dict: {"id": int, "name": str, "course": str, "mark": int}.
+
+Connections come from a process-wide pool (see pool.py) sized by the
+DB_POOL_MIN / DB_POOL_MAX environment variables. get_student_by_id is backed
+by an in-process cache that writes through this module keep current; set
+DB_CACHE_NOTIFY=1 to also invalidate it on writes from other workers.
+Writes only send change notifications (migrations/0012) when DB_CACHE_NOTIFY
+or the SSE feed (SSE_ENABLED) is on, since each one costs a commit-time lock.
+
+Set DB_REPLICA_HOSTS ("host[:port],...") to send request reads to streaming
+replicas; writes always go to DB_HOST. See begin_request().
 """
 
+import contextvars
+import itertools
 import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
 import psycopg2
+from psycopg2.extras import execute_values
 
+import listener
+import metrics
+import migrate
+import queries
+from cache import MISSING, TTLCache
+from pool import ConnectionPool
+
+# Whether this app's writes NOTIFY students_changes (see listener.py)
+NOTIFY_CHANGES = "1" in (os.environ.get("DB_CACHE_NOTIFY", "0"), os.environ.get("SSE_ENABLED", "0"))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ConnectionPool:
+    """
+    Return the pool for this process, creating it on first use. A pool
+    inherited across fork() is never reused since its sockets are shared
+    with the parent.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            _pool = ConnectionPool(
+                minconn=int(os.environ.get("DB_POOL_MIN", "1")),
+                maxconn=int(os.environ.get("DB_POOL_MAX", "10")),
+                timeout=float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+                ping_after=float(os.environ.get("DB_POOL_PING_AFTER", "30")),
+                **connection_params(),
+            )
+            _pool_pid = pid
+    return _pool
+
+
+def connection_params() -> dict:
+    """
+    psycopg2.connect keyword arguments for the configured database.
+    """
+    params = {
+        "host": os.environ["DB_HOST"],
+        "database": os.environ["DB_NAME"],
+        "user": os.environ["DB_USER"],
+        "password": os.environ["DB_PASSWORD"],
+    }
+    if NOTIFY_CHANGES:
+        params["options"] = "-c students.notify_changes=on"
+    return params
+
+
+# Read replicas. A request's reads all go to one replica, picked round-robin
+# by begin_request(), so its ETag version and its data come from the same
+# server. Reads outside a request (background threads) and every write use
+# the primary.
+_replica_pools = []
+_replica_pid = None
+_replica_counter = itertools.count()
+
+# How long a client keeps reading from the primary after its own write, so it
+# never sees a replica that has not replayed that write yet
+READ_YOUR_WRITES_SECONDS = float(os.environ.get("DB_READ_YOUR_WRITES_SECONDS", "5"))
+
+_request_replica = contextvars.ContextVar("db_request_replica", default=None)
+_primary_until = contextvars.ContextVar("db_primary_until", default=0.0)
+
+
+def replica_hosts() -> list[str]:
+    return [h.strip() for h in os.environ.get("DB_REPLICA_HOSTS", "").split(",") if h.strip()]
+
+
+def _get_replica_pools() -> list[ConnectionPool]:
+    global _replica_pools, _replica_pid
+    pid = os.getpid()
+    if _replica_pid == pid:
+        return _replica_pools
+    with _pool_lock:
+        if _replica_pid != pid:
+            pools = []
+            for host in replica_hosts():
+                params = connection_params()
+                params["host"], _, port = host.partition(":")
+                if port:
+                    params["port"] = int(port)
+                pools.append(
+                    # Lazy (minconn=0) so an unreachable replica cannot stop a worker booting
+                    ConnectionPool(
+                        minconn=0,
+                        maxconn=int(os.environ.get("DB_POOL_MAX", "10")),
+                        timeout=float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+                        ping_after=float(os.environ.get("DB_POOL_PING_AFTER", "30")),
+                        **params,
+                    )
+                )
+            _replica_pools = pools
+            _replica_pid = pid
+    return _replica_pools
+
+
+def begin_request(primary_until=0.0):
+    """
+    Route the reads of the request about to be handled on this thread.
+    Parameters: primary_until (float) - epoch seconds until which this client
+    must read from the primary because of a recent write (0 for none)
+    """
+    _primary_until.set(primary_until)
+    pools = _get_replica_pools()
+    _request_replica.set(pools[next(_replica_counter) % len(pools)] if pools else None)
+
+
+def primary_until() -> float:
+    """
+    Epoch seconds until which the current client should keep reading from the
+    primary; moved forward by every write made in this request.
+    """
+    return _primary_until.get()
+
+
+def _read_pool():
+    # The replica for this request's reads, or None for the primary
+    if time.time() < _primary_until.get():
+        return None
+    return _request_replica.get()
+
+
+@contextmanager
+def _connection(pool=None):
+    """
+    Borrow a pooled connection for the duration of a with-block, from the
+    given pool or else the primary.
+    The transaction is committed on a clean exit and rolled back otherwise.
+    """
+    with (pool or _get_pool()).connection() as conn:
+        yield conn
+
+
+def close_pool():
+    """Close every idle pooled connection (e.g. on worker shutdown)."""
+    global _pool, _replica_pid
+    with _pool_lock:
+        if _pool_pid == os.getpid():
+            if _pool is not None:
+                _pool.closeall()
+        if _replica_pid == os.getpid():
+            for pool in _replica_pools:
+                pool.closeall()
+        _pool = None
+        _replica_pid = None
+
+
+def run_migrations(wait_seconds=30.0) -> list[int]:
+    """
+    Apply pending schema migrations (see migrate.py), retrying with backoff
+    while the database is still starting up.
+    Parameters: wait_seconds (float) - how long to keep retrying the connection
+    Returns: list of migration versions applied by this call
+    """
+    deadline = time.monotonic() + wait_seconds
+    delay = 0.25
+    while True:
+        try:
+            with _connection() as conn:
+                return migrate.apply_migrations(conn)
+        except psycopg2.OperationalError:
+            if time.monotonic() + delay > deadline:
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 5.0)
+
+
+_write_listeners = []
+
+
+def add_write_listener(callback):
+    """
+    Register callback(op, student, previous) to run after every committed write
+    made through this module in this process. op is "insert", "update" or
+    "delete"; student is the row after the write (the removed row for deletes)
+    and previous is the row before an update (None otherwise).
+    """
+    _write_listeners.append(callback)
+
+
+def stick_to_primary():
+    """
+    Keep the current client's reads on the primary for READ_YOUR_WRITES_SECONDS;
+    called for every write, and by code that writes on the client's behalf
+    from another thread.
+    """
+    _primary_until.set(time.time() + READ_YOUR_WRITES_SECONDS)
+
+
+def _emit_write(op, student, previous=None):
+    global _student_cache_generation
+    _student_cache_generation += 1
+    stick_to_primary()
+    for callback in _write_listeners:
+        callback(op, student, previous)
+
+
+# Read-through cache of get_student_by_id results, keyed by id
+_student_cache = TTLCache(
+    maxsize=int(os.environ.get("DB_STUDENT_CACHE_SIZE", "10000")),
+    ttl=float(os.environ.get("DB_STUDENT_CACHE_TTL", "30")),
+)
+# Bumped on every write; a read only fills the cache if no write happened
+# while it was in flight, so a slow reader cannot put back a stale row
+_student_cache_generation = 0
+
+
+def _refresh_student_cache(op, student, previous):
+    if op == "update":
+        _student_cache.set(student["id"], student)
+    elif op == "delete":
+        _student_cache.invalidate(student["id"])
+
+
+def _on_change_notification(payload):
+    # Writes made by other workers (see listener.py)
+    global _student_cache_generation
+    _student_cache_generation += 1
+    if payload.get("op") == "resync":
+        _student_cache.clear()
+    elif payload.get("id") is not None:
+        _student_cache.invalidate(payload["id"])
+
+
+def student_cache_stats() -> dict:
+    """
+    Hit, miss and eviction counters of the get_student_by_id cache.
+    """
+    return _student_cache.stats()
 
-def _connection():
-    return psycopg2.connect(
-        host=os.environ["DB_HOST"],
-        database=os.environ["DB_NAME"],
-        user=os.environ["DB_USER"],
-        password=os.environ["DB_PASSWORD"],
-    )
-    # TOOD: remove this joules after successfully connecting to docker postgres
-    return psycopg2.connect(
-        host="db",
-        database="otter",
-        user="otter",
-        password="",
-    )
 
+add_write_listener(_refresh_student_cache)
+listener.subscribe(_on_change_notification)
 
+
+def pool_stats() -> dict:
+    """
+    Pool size and checkout metrics for this process.
+    Returns: dict of counters, including wait and checkout times in seconds.
+    """
+    stats = _get_pool().stats()
+    stats["replicas"] = [pool.stats() for pool in _get_replica_pools()]
+    return stats
+
+
+@metrics.timed_db
 def get_all_students() -> list[dict]:
     """
     Fetch all students from the database.
     Returns: list of dicts [{"id": 1, "name": "...", "course": "...", "mark": 78}, ...]
     """
-    conn = _connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, name, course, mark FROM students ORDER BY id;")
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+    with _connection(_read_pool()) as conn, conn.cursor() as cur:
+        cur.execute("SELECT id, name, course, mark FROM students ORDER BY id;")
+        rows = cur.fetchall()
     return [{"id": r[0], "name": r[1], "course": r[2], "mark": r[3]} for r in rows]
 
 
+@metrics.timed_db
+def list_students(filters=None, sort="id", order="asc", after=None, limit=100):
+    """
+    Fetch one page of students (keyset pagination).
+    Parameters: filters (dict with any of course, min_mark, max_mark, q),
+    sort (one of queries.SORT_COLUMNS), order ("asc"/"desc"), after ((sort value, id)
+    of the last row on the previous page, or None), limit (int).
+    Returns: (list of student dicts, (sort value, id) cursor for the next page
+    or None if this is the last page)
+    """
+    sql, params = queries.student_query(filters, sort, order, after)
+    with _connection(_read_pool()) as conn, conn.cursor() as cur:
+        cur.execute(sql + " LIMIT %s;", params + [limit + 1])
+        rows = cur.fetchall()
+    students = [{"id": r[0], "name": r[1], "course": r[2], "mark": r[3]} for r in rows[:limit]]
+    next_after = None
+    if len(rows) > limit:
+        last = students[-1]
+        next_after = (last[sort], last["id"])
+    return students, next_after
+
+
+@metrics.timed_db
+def get_student_columns(filters=None, sort="id", order="asc", after=None, limit=None):
+    """
+    Fetch students in column-oriented form, without building a dict per row.
+    Parameters: as for list_students; limit=None returns every matching row.
+    Returns: ({"id": [...], "name": [...], "course": [...], "mark": [...]},
+    (sort value, id) cursor for the next page or None)
+    """
+    sql, params = queries.student_query(filters, sort, order, after)
+    with _connection(_read_pool()) as conn, conn.cursor() as cur:
+        if limit is None:
+            cur.execute(sql + ";", params)
+        else:
+            cur.execute(sql + " LIMIT %s;", params + [limit + 1])
+        rows = cur.fetchall()
+    next_after = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_after = (last[queries.SORT_COLUMNS.index(sort)], last[0])
+    ids, names, courses, marks = (list(c) for c in zip(*rows)) if rows else ([], [], [], [])
+    return {"id": ids, "name": names, "course": courses, "mark": marks}, next_after
+
+
+@metrics.timed_db
+def iter_students(filters=None, sort="id", order="asc", after=None, batch_size=1000):
+    """
+    Lazily yield every matching student using a server-side (named) cursor,
+    so only batch_size rows are held in memory at a time.
+    Parameters: as for list_students, plus batch_size (int)
+    Returns: generator of student dicts
+    """
+    sql, params = queries.student_query(filters, sort, order, after)
+    with _connection(_read_pool()) as conn:
+        with conn.cursor(name=f"students_{uuid.uuid4().hex}") as cur:
+            cur.itersize = batch_size
+            cur.execute(sql + ";", params)
+            for r in cur:
+                yield {"id": r[0], "name": r[1], "course": r[2], "mark": r[3]}
+
+
+@metrics.timed_db
+def export_students_ndjson(filters=None, sort="id", order="asc", batch_size=5000):
+    """
+    Yield every matching student as one JSON text line, built by Postgres and
+    read through a server-side cursor, so no rows become Python dicts.
+    Parameters: as for list_students, plus batch_size (int)
+    Returns: generator of str, each a JSON object followed by a newline
+    """
+    sql, params = queries.student_query(filters, sort, order, select=queries.STUDENT_JSON)
+    with _connection(_read_pool()) as conn:
+        with conn.cursor(name=f"students_{uuid.uuid4().hex}") as cur:
+            cur.itersize = batch_size
+            cur.execute(sql + ";", params)
+            for r in cur:
+                yield r[0] + "\n"
+
+
+_EXPORT_DONE = object()
+
+
+class _ChunkWriter:
+    """File-like target for copy_expert that hands fixed-size chunks to a queue."""
+
+    def __init__(self, chunks, cancelled, chunk_size):
+        self.chunks = chunks
+        self.cancelled = cancelled
+        self.chunk_size = chunk_size
+        self.buffer = []
+        self.buffered = 0
+
+    def write(self, data):
+        # COPY delivers one row per call; batch them into larger chunks
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.buffered >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            _put_until_cancelled(self.chunks, b"".join(self.buffer), self.cancelled)
+            self.buffer, self.buffered = [], 0
+
+
+def _put_until_cancelled(chunks, item, cancelled):
+    # Block while the consumer is slow, but give up once it has gone away
+    while not cancelled.is_set():
+        try:
+            chunks.put(item, timeout=1.0)
+            return
+        except queue.Full:
+            pass
+
+
+@metrics.timed_db
+def export_students_csv(filters=None, sort="id", order="asc", chunk_size=65536, max_chunks=16):
+    """
+    Yield every matching student as CSV (with a header row) straight from
+    COPY ... TO STDOUT. The COPY runs on its own thread and feeds a bounded
+    queue, so memory stays at roughly max_chunks * chunk_size however many
+    rows there are, and a slow client slows the COPY down instead.
+    Parameters: as for list_students, plus chunk_size and max_chunks (int)
+    Returns: generator of bytes
+    """
+    sql, params = queries.student_query(filters, sort, order)
+    # Chosen here: the COPY thread does not see this request's routing
+    pool = _read_pool()
+    chunks = queue.Queue(maxsize=max_chunks)
+    cancelled = threading.Event()
+    # The connection running the COPY, while it runs; guarded so it is never
+    # cancelled after going back to the pool
+    active = {}
+    active_lock = threading.Lock()
+
+    def copy():
+        try:
+            with _connection(pool) as conn, conn.cursor() as cur:
+                with active_lock:
+                    # The client may have gone while we waited for a connection;
+                    # after this, a cancel will find the connection to stop
+                    if cancelled.is_set():
+                        return
+                    active["conn"] = conn
+                try:
+                    copy_sql = f"COPY ({cur.mogrify(sql, params).decode()}) TO STDOUT WITH (FORMAT csv, HEADER)"
+                    writer = _ChunkWriter(chunks, cancelled, chunk_size)
+                    cur.copy_expert(copy_sql, writer)
+                    writer.flush()
+                finally:
+                    with active_lock:
+                        active.pop("conn", None)
+            _put_until_cancelled(chunks, _EXPORT_DONE, cancelled)
+        except Exception as e:
+            _put_until_cancelled(chunks, e, cancelled)
+
+    thread = threading.Thread(target=copy, name="students-export", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = chunks.get()
+            if item is _EXPORT_DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+        with active_lock:
+            if "conn" in active:
+                # The client went away mid-export: stop the query server-side
+                active["conn"].cancel()
+        thread.join()
+
+
+@metrics.timed_db
 def get_student_by_id(student_id: int):
     """
-    Fetch one student by id.
+    Fetch one student by id, served from the in-process cache when possible.
     Parameters: student_id (int)
     Returns: dict or None if not found
     """
-    conn = _connection()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT id, name, course, mark FROM students WHERE id = %s;", (student_id,)
-    )
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
+    cached = _student_cache.get(student_id)
+    if cached is not MISSING:
+        return dict(cached)
+    generation = _student_cache_generation
+    replica = _read_pool()
+    with _connection(replica) as conn, conn.cursor() as cur:
+        cur.execute(queries.SELECT_STUDENT, (student_id,))
+        row = cur.fetchone()
     if not row:
         return None
-    return {"id": row[0], "name": row[1], "course": row[2], "mark": row[3]}
+    student = {"id": row[0], "name": row[1], "course": row[2], "mark": row[3]}
+    # A lagging replica can return a row older than the last invalidation,
+    # so only primary reads are cached
+    if replica is None and generation == _student_cache_generation:
+        _student_cache.set(student_id, student)
+    return dict(student)
+
+
+@metrics.timed_db
+def get_students_by_ids(ids) -> dict:
+    """
+    Fetch several students in one query, bypassing the cache.
+    Parameters: ids (iterable of int)
+    Returns: dict of id -> student dict; ids that do not exist are left out
+    """
+    with _connection(_read_pool()) as conn, conn.cursor() as cur:
+        cur.execute(queries.SELECT_STUDENTS_BY_ID, (list(ids),))
+        rows = cur.fetchall()
+    return {row[0]: {"id": row[0], "name": row[1], "course": row[2], "mark": row[3]} for row in rows}
 
 
+@metrics.timed_db
 def insert_student(name, course, mark):
     """
     Insert a new student. Parameters: name (str), course (str), mark (int).
     Returns: dict of the new student including id.
     """
-    conn = _connection()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO students (name, course, mark) VALUES (%s, %s, %s) RETURNING id, name, course, mark;",
-        (name, course, mark),
-    )
-    row = cur.fetchone()
-    conn.commit()
-    cur.close()
-    conn.close()
-    return {"id": row[0], "name": row[1], "course": row[2], "mark": row[3]}
+    with _connection() as conn, conn.cursor() as cur:
+        cur.execute(queries.INSERT_STUDENT, (name, course, mark))
+        row = cur.fetchone()
+    student = {"id": row[0], "name": row[1], "course": row[2], "mark": row[3]}
+    _emit_write("insert", student)
+    return student
+
+
+@metrics.timed_db
+def bulk_insert_students(students, page_size=1000):
+    """
+    Insert many students in one transaction using multi-row INSERTs.
+    Parameters: students (list of (name, course, mark) tuples), page_size (int)
+    - number of rows sent per INSERT statement.
+    Returns: list of new ids, in the same order as students.
+    """
+    if not students:
+        return []
+    with _connection() as conn, conn.cursor() as cur:
+        rows = execute_values(
+            cur,
+            "INSERT INTO students (name, course, mark) VALUES %s RETURNING id;",
+            students,
+            page_size=page_size,
+            fetch=True,
+        )
+    ids = [r[0] for r in rows]
+    for new_id, (name, course, mark) in zip(ids, students):
+        _emit_write("insert", {"id": new_id, "name": name, "course": course, "mark": mark})
+    return ids
+
+
+@metrics.timed_db
+def insert_students_grouped(students):
+    """
+    Insert the students of several requests in one transaction: ids are
+    allocated first, then a single multi-row INSERT writes every row.
+    Parameters: students (list of (name, course, mark) tuples)
+    Returns: list of created student dicts, in the same order as students
+    """
+    with _connection() as conn, conn.cursor() as cur:
+        cur.execute(queries.ALLOCATE_STUDENT_IDS, (len(students),))
+        ids = [r[0] for r in cur.fetchall()]
+        rows = [(new_id, *student) for new_id, student in zip(ids, students)]
+        execute_values(cur, queries.INSERT_STUDENTS_WITH_IDS, rows, page_size=len(rows))
+    created = []
+    for new_id, name, course, mark in rows:
+        student = {"id": new_id, "name": name, "course": course, "mark": mark}
+        _emit_write("insert", student)
+        created.append(student)
+    return created
 
 
+@metrics.timed_db
 def update_student(student_id, name=None, course=None, mark=None):
     """
-    Update a student. Parameters: student_id (int), and optionally name, course, mark.
+    Update a student in a single statement. Parameters: student_id (int), and
+    optionally name, course, mark. Fields left as None (or "" for name/course)
+    keep their current value.
     Returns: updated student dict or None if not found.
     """
-    existing = get_student_by_id(student_id)
-    if not existing:
+    with _connection() as conn, conn.cursor() as cur:
+        cur.execute(queries.UPDATE_STUDENT, (name, course, mark, student_id))
+        row = cur.fetchone()
+    if not row:
         return None
-    new_name = name if name is not None and name != "" else existing["name"]
-    new_course = course if course is not None and course != "" else existing["course"]
-    new_mark = mark if mark is not None else existing["mark"]
-    conn = _connection()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE students SET name = %s, course = %s, mark = %s WHERE id = %s RETURNING id, name, course, mark;",
-        (new_name, new_course, new_mark, student_id),
+    student = {"id": row[0], "name": row[1], "course": row[2], "mark": row[3]}
+    _emit_write(
+        "update", student, {"id": row[0], "name": row[4], "course": row[5], "mark": row[6]}
     )
-    row = cur.fetchone()
-    conn.commit()
-    cur.close()
-    conn.close()
-    return {"id": row[0], "name": row[1], "course": row[2], "mark": row[3]}
+    return student
 
 
+@metrics.timed_db
 def delete_student(student_id):
     """
     Delete a student by id.
     Parameters: student_id (int)
-    Returns: {"id": student_id} if deleted, or None if not found.
-    """
-    conn = _connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM students WHERE id = %s RETURNING id;", (student_id,))
-    row = cur.fetchone()
-    conn.commit()
-    cur.close()
-    conn.close()
+    Returns: dict of the deleted student, or None if not found.
+    """
+    with _connection() as conn, conn.cursor() as cur:
+        cur.execute(queries.DELETE_STUDENT, (student_id,))
+        row = cur.fetchone()
     if not row:
         return None
-    return {"id": row[0]}
+    student = {"id": row[0], "name": row[1], "course": row[2], "mark": row[3]}
+    _emit_write("delete", student)
+    return student
+
+
+@metrics.timed_db
+def batch_update_students(updates):
+    """
+    Apply many partial updates in one set-based UPDATE and one transaction.
+    Parameters: updates (list of (student_id, name, course, mark) tuples, ids
+    unique; None fields keep their current value, as in update_student)
+    Returns: (list of updated student dicts, list of ids that were not found)
+    """
+    if not updates:
+        return [], []
+    with _connection() as conn, conn.cursor() as cur:
+        rows = execute_values(
+            cur,
+            queries.BATCH_UPDATE_STUDENTS,
+            updates,
+            template=queries.BATCH_UPDATE_TEMPLATE,
+            page_size=len(updates),
+            fetch=True,
+        )
+    updated = []
+    for r in rows:
+        student = {"id": r[0], "name": r[1], "course": r[2], "mark": r[3]}
+        _emit_write("update", student, {"id": r[0], "name": r[4], "course": r[5], "mark": r[6]})
+        updated.append(student)
+    found = {student["id"] for student in updated}
+    return updated, [u[0] for u in updates if u[0] not in found]
+
+
+@metrics.timed_db
+def delete_students(ids=None, course=None):
+    """
+    Delete many students in one statement, either by id or by course.
+    Parameters: ids (list of int) or course (str); exactly one must be given.
+    Returns: (list of deleted student dicts, list of requested ids not found)
+    """
+    if (ids is None) == (course is None):
+        raise ValueError("pass exactly one of ids or course")
+    with _connection() as conn, conn.cursor() as cur:
+        if ids is not None:
+            cur.execute(queries.DELETE_STUDENTS_BY_ID, (list(ids),))
+        else:
+            cur.execute(queries.DELETE_STUDENTS_BY_COURSE, (course,))
+        rows = cur.fetchall()
+    deleted = []
+    for r in rows:
+        student = {"id": r[0], "name": r[1], "course": r[2], "mark": r[3]}
+        _emit_write("delete", student)
+        deleted.append(student)
+    found = {student["id"] for student in deleted}
+    return deleted, [i for i in (ids or []) if i not in found]
+
+
+@metrics.timed_db
+def get_data_version() -> int:
+    """
+    Current value of the students change counter (see migrations/0005, 0010).
+    It increases with every committed insert, update or delete on students and
+    is read from a small, periodically compacted log without touching the
+    students rows.
+    Returns: int
+    """
+    with _connection(_read_pool()) as conn, conn.cursor() as cur:
+        cur.execute(queries.DATA_VERSION)
+        row = cur.fetchone()
+    return row[0] if row else 0
+
+
+@metrics.timed_db
+def get_stats():
+    """
+    Aggregate count, sum, min and max over all student marks.
+    Reads the trigger-maintained student_mark_counts histogram (a few rows
+    per distinct mark between compactions), so the cost does not grow with
+    the students table.
+    Returns: {"count": int, "sum": int, "min": int, "max": int}, or None if
+    there are no marks.
+    """
+    with _connection(_read_pool()) as conn, conn.cursor() as cur:
+        cur.execute(queries.STATS)
+        row = cur.fetchone()
+    if not row or not row[0]:
+        return None
+    return {"count": int(row[0]), "sum": int(row[1]), "min": row[2], "max": row[3]}
+
+
+@metrics.timed_db
+def get_stats_as_of(as_of):
+    """
+    Aggregate count, sum, min and max over student marks as they were at a
+    point in time, rebuilt from student_history.
+    Parameters: as_of (timezone-aware datetime)
+    Returns: as for get_stats, or None if there were no marks then.
+    """
+    with _connection(_read_pool()) as conn, conn.cursor() as cur:
+        cur.execute(queries.STATS_AS_OF, (as_of,))
+        row = cur.fetchone()
+    if not row or not row[0]:
+        return None
+    return {"count": int(row[0]), "sum": int(row[1]), "min": row[2], "max": row[3]}
+
+
+@metrics.timed_db
+def get_student_history(student_id: int) -> list[dict]:
+    """
+    Every recorded change to one student, oldest first.
+    Parameters: student_id (int)
+    Returns: list of {"op", "name", "course", "mark", "changed_at"} dicts,
+    changed_at as an ISO 8601 string; empty if the id was never seen.
+    """
+    with _connection(_read_pool()) as conn, conn.cursor() as cur:
+        cur.execute(queries.STUDENT_HISTORY, (student_id,))
+        rows = cur.fetchall()
+    return [
+        {"op": r[0], "name": r[1], "course": r[2], "mark": r[3], "changed_at": r[4].isoformat()}
+        for r in rows
+    ]
+
+
+def _ranked(row):
+    return {
+        "id": row[0],
+        "name": row[1],
+        "course": row[2],
+        "mark": row[3],
+        "rank": row[4],
+        "course_size": row[5],
+    }
+
+
+@metrics.timed_db
+def get_student_rank(student_id: int):
+    """
+    A student's rank within their course, from the student_ranks view (which
+    trails writes by the refresh debounce, see ranks.py).
+    Parameters: student_id (int)
+    Returns: dict with id, name, course, mark, rank and course_size, or None
+    if the student is not ranked (unknown, unmarked or not yet refreshed)
+    """
+    with _connection(_read_pool()) as conn, conn.cursor() as cur:
+        cur.execute(queries.STUDENT_RANK, (student_id,))
+        row = cur.fetchone()
+    return _ranked(row) if row else None
+
+
+@metrics.timed_db
+def get_course_leaderboard(course, limit=10) -> list[dict]:
+    """
+    The top of one course's ranking, best mark first (ties share a rank).
+    Parameters: course (str), limit (int)
+    Returns: list of dicts as for get_student_rank; empty for an unknown course
+    """
+    with _connection(_read_pool()) as conn, conn.cursor() as cur:
+        cur.execute(queries.COURSE_LEADERBOARD, (course, limit))
+        rows = cur.fetchall()
+    return [_ranked(r) for r in rows]
+
+
+@metrics.timed_db
+def refresh_student_ranks() -> bool:
+    """
+    Rebuild the student_ranks view without blocking its readers. Only one
+    session refreshes at a time; others return straight away.
+    Returns: True if refreshed, False if another refresh held the lock
+    """
+    with _connection() as conn, conn.cursor() as cur:
+        cur.execute(queries.REFRESH_STUDENT_RANKS_LOCK)
+        if not cur.fetchone()[0]:
+            return False
+        cur.execute(queries.REFRESH_STUDENT_RANKS)
+    return True
+
+
+HISTOGRAM_BUCKETS = 10
+
+
+@metrics.timed_db
+def get_course_stats(course=None) -> list[dict]:
+    """
+    Per-course mark distribution, computed in the database with one GROUP BY
+    statement (see queries.course_stats_query).
+    Parameters: course (str or None) - restrict to one course, None for all.
+    Returns: list of dicts ordered by course, each with count, mean, median,
+    p25, p75, p90, stddev, min, max and a 10-bucket histogram of marks
+    (0-9, 10-19, ..., 90-100). Courses without any marks are omitted.
+    """
+    sql, params = queries.course_stats_query(course, HISTOGRAM_BUCKETS)
+    with _connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+
+    result = []
+    for r in rows:
+        counts = r[10:]
+        result.append(
+            {
+                "course": r[0],
+                "count": r[1],
+                "mean": r[2],
+                "median": r[3],
+                "p25": r[4],
+                "p75": r[5],
+                "p90": r[6],
+                "stddev": r[7],
+                "min": r[8],
+                "max": r[9],
+                "histogram": [
+                    {
+                        "range": f"{i * 10}-{i * 10 + 9 if i < HISTOGRAM_BUCKETS - 1 else 100}",
+                        "count": counts[i],
+                    }
+                    for i in range(HISTOGRAM_BUCKETS)
+                ],
+            }
+        )
+    return result
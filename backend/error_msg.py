@@ -3,3 +3,15 @@ ERROR_COURSE = "wtf Course name has incorrect data"
 ERROR_MARK = "Are you retarded, Mark has incorrect data"
 ERROR_JSON = "Da fuq Data must be json"
 ERROR_ID = "Wtf are you enumerating student id?"
+ERROR_BUSY = "Database is flat out busy, try again shortly"
+ERROR_PAGE = "Bruh, after_id, cursor and limit must come from a real page"
+ERROR_BULK_SIZE = "Chill, that is way too many students for one upload"
+ERROR_COURSE_NOT_FOUND = "Nobody is doing that course mate"
+ERROR_CONSTRAINT = "Nah, the database says that data is garbage"
+ERROR_SORT = "Cannot sort by that, pick id, name, course or mark and asc or desc"
+ERROR_BATCH_FILTER = "Give me ids OR a course to delete, not both and not neither"
+ERROR_FORMAT = "Pick an export format that exists: csv or ndjson"
+ERROR_RATE = "Slow down, too many requests from you"
+ERROR_AS_OF = "as_of has to be an ISO 8601 timestamp, e.g. 2025-03-01T09:00:00Z"
+ERROR_LEADERBOARD_LIMIT = "limit has to be a whole number above zero"
+ERROR_FEED_DISABLED = "Live changes are switched off on this server"
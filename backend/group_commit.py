@@ -0,0 +1,153 @@
+"""
+Group commit for POST /students.
+
+With DB_GROUP_COMMIT=1, inserts from concurrent requests are collected by
+one writer thread per process for up to DB_GROUP_COMMIT_WINDOW_MS (or until
+DB_GROUP_COMMIT_MAX_BATCH rows) and written by db.insert_students_grouped in
+a single transaction, so the whole batch shares one commit and one fsync.
+Each request still returns only after its own row has been committed, so
+durability is the same as for db.insert_student.
+
+If a batch fails because a row breaks a constraint or holds bad data, its
+rows are retried one by one so only the offending request sees the error. Any
+other failure (no pool connection, lost database) fails the whole batch
+straight away rather than retrying it row by row against a struggling
+database. A request whose row is still queued after DB_GROUP_COMMIT_TIMEOUT_MS
+is withdrawn and gets the same 503 as a pool timeout; once the writer has
+taken a row into a batch, its request waits for the real outcome, so a 503
+always means the row was not written.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+
+import psycopg2
+
+import db
+from pool import PoolTimeout
+
+ENABLED = os.environ.get("DB_GROUP_COMMIT", "0") == "1"
+WINDOW_SECONDS = float(os.environ.get("DB_GROUP_COMMIT_WINDOW_MS", "2")) / 1000
+MAX_BATCH = int(os.environ.get("DB_GROUP_COMMIT_MAX_BATCH", "100"))
+WAIT_SECONDS = float(os.environ.get("DB_GROUP_COMMIT_TIMEOUT_MS", "15000")) / 1000
+
+logger = logging.getLogger(__name__)
+
+_pending = queue.Queue()
+_thread = None
+_thread_pid = None
+_lock = threading.Lock()
+_counts = {"batches": 0, "rows": 0, "fallbacks": 0, "failed_batches": 0, "timeouts": 0, "largest_batch": 0}
+
+
+class _Insert:
+    __slots__ = ("student", "done", "result", "error", "state")
+
+    def __init__(self, student):
+        self.student = student
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # "queued", then "claimed" by the writer or "abandoned" by the request
+        self.state = "queued"
+
+
+def insert_student(name, course, mark):
+    """
+    Insert one student, coalescing with concurrent inserts when enabled.
+    Same arguments, return value and exceptions as db.insert_student.
+    """
+    if not ENABLED:
+        return db.insert_student(name, course, mark)
+    _ensure_thread()
+    item = _Insert((name, course, mark))
+    _pending.put(item)
+    if not item.done.wait(WAIT_SECONDS):
+        with _lock:
+            if item.state == "queued":
+                item.state = "abandoned"
+                _counts["timeouts"] += 1
+        if item.state == "abandoned":
+            raise PoolTimeout(f"group commit did not start within {WAIT_SECONDS}s")
+        # Already in a batch being written: the row may commit, so wait for it
+        item.done.wait()
+    # The write ran on the writer thread; keep this client on the primary
+    db.stick_to_primary()
+    if item.error is not None:
+        raise item.error
+    return item.result
+
+
+def stats() -> dict:
+    with _lock:
+        return dict(_counts, enabled=int(ENABLED), pending=_pending.qsize())
+
+
+def _ensure_thread():
+    global _thread, _thread_pid
+    if _thread is not None and _thread.is_alive() and _thread_pid == os.getpid():
+        return
+    with _lock:
+        if _thread is None or not _thread.is_alive() or _thread_pid != os.getpid():
+            _thread = threading.Thread(target=_run, name="group-commit", daemon=True)
+            _thread_pid = os.getpid()
+            _thread.start()
+
+
+def _collect():
+    # Block for the first insert, then gather more until the window closes
+    batch = [_pending.get()]
+    deadline = time.monotonic() + WINDOW_SECONDS
+    while len(batch) < MAX_BATCH:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(_pending.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+
+def _claim(items):
+    # Take ownership of the rows whose requests are still waiting
+    with _lock:
+        claimed = [item for item in items if item.state == "queued"]
+        for item in claimed:
+            item.state = "claimed"
+    return claimed
+
+
+def _run():
+    while True:
+        batch = _claim(_collect())
+        if not batch:
+            continue
+        try:
+            created = db.insert_students_grouped([item.student for item in batch])
+            for item, student in zip(batch, created):
+                item.result = student
+        except (psycopg2.IntegrityError, psycopg2.DataError):
+            logger.warning("Group commit of %d rows failed, retrying one by one", len(batch), exc_info=True)
+            with _lock:
+                _counts["fallbacks"] += 1
+            for item in batch:
+                try:
+                    item.result = db.insert_student(*item.student)
+                except Exception as e:
+                    item.error = e
+        except Exception as e:
+            logger.warning("Group commit of %d rows failed", len(batch), exc_info=True)
+            with _lock:
+                _counts["failed_batches"] += 1
+            for item in batch:
+                item.error = e
+        with _lock:
+            _counts["batches"] += 1
+            _counts["rows"] += len(batch)
+            _counts["largest_batch"] = max(_counts["largest_batch"], len(batch))
+        for item in batch:
+            item.done.set()
@@ -0,0 +1,80 @@
+"""
+Gunicorn settings for the production backend container.
+
+    gunicorn -c gunicorn.conf.py "app:create_app()"
+
+Every setting can be overridden from the environment (see docker-compose.yml).
+
+Choosing worker counts:
+- Each worker is a separate process with its own connection pool, so
+  WEB_CONCURRENCY * DB_POOL_MAX must stay below Postgres max_connections
+  (100 by default).
+- The default is (2 x cores) + 1 processes, the usual gunicorn starting point
+  for a service that spends most of its time waiting on the database.
+- Each worker also runs GUNICORN_THREADS threads (gthread worker), which is what
+  lets slow or streaming responses overlap within one process. Keep
+  DB_POOL_MAX >= GUNICORN_THREADS so threads do not queue for a connection.
+
+Graceful reload: `kill -HUP <master pid>` (or `docker compose kill -s HUP backend`)
+starts fresh workers with the new code and lets the old ones finish their
+in-flight requests within graceful_timeout.
+"""
+
+import multiprocessing
+import os
+import subprocess
+import sys
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+worker_class = "gthread"
+
+# Seconds an idle HTTP keep-alive connection is held open for the next request
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+
+# Recycle workers now and then so slow leaks cannot accumulate
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+# The app (and therefore the db pool) must be built inside each worker
+preload_app = False
+reload = os.environ.get("GUNICORN_RELOAD", "0") == "1"
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOGLEVEL", "info")
+
+
+def _migrate(server):
+    # Runs in a child process, so the master never imports the app's modules
+    # and workers forked after a reload load fresh copies of them
+    if os.environ.get("DB_MIGRATE_ON_START", "1") != "1":
+        return
+    server.log.info("Applying schema migrations")
+    subprocess.run([sys.executable, "migrate.py"], cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+
+
+def on_starting(server):
+    # Apply schema migrations once, before any worker forks. A failed
+    # migration stops gunicorn instead of every worker retrying it.
+    _migrate(server)
+
+
+def on_reload(server):
+    # New code may come with new migrations (kill -HUP)
+    _migrate(server)
+
+
+def post_fork(server, worker):
+    # The master has already migrated; only this worker's create_app skips it
+    os.environ["DB_MIGRATE_ON_START"] = "0"
+
+
+def worker_exit(server, worker):
+    import db
+
+    db.close_pool()
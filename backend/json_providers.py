@@ -0,0 +1,71 @@
+"""
+Pluggable JSON providers for the Flask app.
+
+JSON_PROVIDER=orjson (the default when the optional orjson package is
+installed) encodes responses with orjson, which is several times faster than
+the standard library for large student lists. JSON_PROVIDER=default keeps
+Flask's built-in encoder. Both record encode time for the serialize metrics.
+"""
+
+import os
+import time
+
+from flask.json.provider import DefaultJSONProvider
+
+import metrics
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Default JSON encoding, timed for the serialize metrics."""
+
+    def dumps(self, obj, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            metrics.add_serialize_time(time.perf_counter() - start)
+
+
+class OrjsonProvider(TimedJSONProvider):
+    """orjson encoding; responses are built from bytes without a str round trip."""
+
+    def _encode(self, obj):
+        start = time.perf_counter()
+        try:
+            return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS)
+        finally:
+            metrics.add_serialize_time(time.perf_counter() - start)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Formatting options (indent, sort_keys, ...) need the stdlib encoder
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._encode(obj), mimetype=self.mimetype)
+
+
+PROVIDERS = {"default": TimedJSONProvider, "orjson": OrjsonProvider}
+
+
+def provider_class():
+    """
+    The provider selected by JSON_PROVIDER, falling back to the default
+    encoder when orjson is requested but not installed.
+    """
+    name = os.environ.get("JSON_PROVIDER", "orjson" if orjson is not None else "default")
+    if name == "orjson" and orjson is None:
+        name = "default"
+    return PROVIDERS[name]
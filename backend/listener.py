@@ -0,0 +1,119 @@
+"""
+Cross-worker change notifications over Postgres LISTEN/NOTIFY.
+
+Migration 0012 makes every committed write statement on students send one
+NOTIFY on the students_changes channel, {"changes": [...]}, which is split
+here so subscribers get one small JSON payload per changed row:
+
+    {"op": "insert" | "update" | "delete", "id": 7, "course": "COMP1531",
+     "old_course": "COMP2521" or null}
+
+Statements touching many rows (and TRUNCATE) send {"op": "resync"} instead,
+and subscribers also receive it whenever the listener (re)connects, since
+changes made while it was disconnected were never delivered; caches should
+drop everything on resync. Only sessions opened with db.NOTIFY_CHANGES set
+send notifications at all.
+
+start() runs one daemon thread per process holding a dedicated connection
+that LISTENs on that channel and hands each payload to every subscriber.
+It is what keeps the in-process caches of several gunicorn workers in step.
+"""
+
+import json
+import logging
+import os
+import select
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+CHANNEL = "students_changes"
+
+logger = logging.getLogger(__name__)
+
+_subscribers = []
+_thread = None
+_thread_pid = None
+_lock = threading.Lock()
+_stop = threading.Event()
+
+
+def subscribe(callback):
+    """
+    Register callback(payload_dict) for every change notification.
+    Callbacks run on the listener thread and should return quickly.
+    """
+    _subscribers.append(callback)
+
+
+def unsubscribe(callback):
+    try:
+        _subscribers.remove(callback)
+    except ValueError:
+        pass
+
+
+def running() -> bool:
+    return _thread is not None and _thread.is_alive() and _thread_pid == os.getpid()
+
+
+def start(dsn):
+    """
+    Start the listener thread for this process if it is not already running.
+    Parameters: dsn (dict of psycopg2.connect keyword arguments)
+    """
+    global _thread, _thread_pid
+    with _lock:
+        if running():
+            return
+        _stop.clear()
+        _thread = threading.Thread(target=_run, args=(dsn,), name="pg-listener", daemon=True)
+        _thread_pid = os.getpid()
+        _thread.start()
+
+
+def stop():
+    _stop.set()
+
+
+def _dispatch(raw):
+    try:
+        payload = json.loads(raw)
+    except ValueError:
+        logger.warning("Ignoring malformed %s payload: %r", CHANNEL, raw)
+        return
+    for change in payload.get("changes") or [payload]:
+        for callback in list(_subscribers):
+            try:
+                callback(change)
+            except Exception:
+                logger.exception("%s subscriber failed", CHANNEL)
+
+
+def _run(dsn):
+    delay = 0.5
+    while not _stop.is_set():
+        conn = None
+        try:
+            conn = psycopg2.connect(**dsn)
+            conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANNEL};")
+            # Anything cached before (re)connecting may have missed changes
+            _dispatch(json.dumps({"op": "resync"}))
+            delay = 0.5
+            while not _stop.is_set():
+                if select.select([conn], [], [], 5.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    _dispatch(conn.notifies.pop(0).payload)
+        except psycopg2.Error:
+            logger.warning("Lost %s listener connection, retrying in %.1fs", CHANNEL, delay)
+            time.sleep(delay)
+            delay = min(delay * 2, 10.0)
+        finally:
+            if conn is not None:
+                conn.close()
@@ -0,0 +1,236 @@
+"""
+In-process request and query instrumentation, rendered in the Prometheus
+text exposition format by GET /metrics.
+
+Metrics are per worker process: with several gunicorn workers each scrape
+sees whichever worker answered, identified by the "pid" label on every
+sample.
+
+Per-request timings (db time, JSON serialisation time) are collected in a
+context variable so the Server-Timing header can break a response down.
+"""
+
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra) + [("pid", os.getpid())]
+    inner = ",".join(f'{k}="{str(v)}"'.replace("\n", " ") for k, v in pairs)
+    return "{" + inner + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [bucket counts..., +Inf count, sum]
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, series in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, series):
+                    labels = _format_labels(self.labels, label_values, [("le", bound)])
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                count = series[len(self.buckets)]
+                labels = _format_labels(self.labels, label_values, [("le", "+Inf")])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labels, label_values)
+                lines.append(f"{self.name}_sum{labels} {series[-1]}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Gauges:
+    """Gauges read from a callback at scrape time, e.g. pool or cache counters."""
+
+    def __init__(self, prefix, help_text, collect):
+        self.prefix = prefix
+        self.help = help_text
+        self.collect = collect
+        with _registry_lock:
+            _registry.append(self)
+
+    def render(self):
+        lines = []
+        for key, value in sorted(self.collect().items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{self.prefix}_{key}"
+            lines.append(f"# HELP {name} {self.help} ({key})")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{_format_labels((), ())} {value}")
+        return lines
+
+
+def render() -> str:
+    """All registered metrics in Prometheus text format."""
+    lines = []
+    with _registry_lock:
+        metrics = list(_registry)
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "Time spent handling a request", ("route", "method", "status")
+)
+http_response_bytes = Histogram(
+    "http_response_size_bytes", "Size of response bodies", ("route",), buckets=SIZE_BUCKETS
+)
+db_query_seconds = Histogram(
+    "db_query_duration_seconds", "Time spent in each db.py function", ("function",)
+)
+db_rows_returned = Counter(
+    "db_rows_returned_total", "Rows returned by each db.py function", ("function",)
+)
+json_serialize_seconds = Histogram(
+    "json_serialize_duration_seconds", "Time spent encoding JSON responses"
+)
+
+
+class RequestTiming:
+    __slots__ = ("db", "serialize")
+
+    def __init__(self):
+        self.db = 0.0
+        self.serialize = 0.0
+
+
+_current = contextvars.ContextVar("request_timing", default=None)
+
+
+def start_request() -> RequestTiming:
+    timing = RequestTiming()
+    _current.set(timing)
+    return timing
+
+
+def current_request():
+    return _current.get()
+
+
+def add_serialize_time(seconds):
+    json_serialize_seconds.observe(seconds)
+    timing = _current.get()
+    if timing is not None:
+        timing.serialize += seconds
+
+
+def _row_count(result):
+    if result is None:
+        return 0
+    if isinstance(result, tuple) and result:
+        # (page, cursor) pairs from list_students / get_student_columns
+        result = result[0]
+    if isinstance(result, dict):
+        # Column-oriented tables count their rows, single students count as one
+        return len(result["id"]) if isinstance(result.get("id"), list) else 1
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+
+def _record_db(name, seconds, rows):
+    db_query_seconds.observe(seconds, name)
+    if rows:
+        db_rows_returned.inc(name, amount=rows)
+    timing = _current.get()
+    if timing is not None:
+        timing.db += seconds
+
+
+def timed_db(fn):
+    """
+    Decorator for db.py functions: records call time and rows returned, and
+    adds the time to the current request's db total. Generator functions are
+    timed across every step so streamed queries are counted too.
+    """
+    name = fn.__name__
+
+    if inspect.isgeneratorfunction(fn):
+
+        @functools.wraps(fn)
+        def generator_wrapper(*args, **kwargs):
+            elapsed, rows = 0.0, 0
+            gen = fn(*args, **kwargs)
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(gen)
+                    finally:
+                        elapsed += time.perf_counter() - start
+                    rows += 1
+                    yield item
+            except StopIteration:
+                return
+            finally:
+                gen.close()
+                _record_db(name, elapsed, rows)
+
+        return generator_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = None
+        try:
+            result = fn(*args, **kwargs)
+            return result
+        finally:
+            _record_db(name, time.perf_counter() - start, _row_count(result))
+
+    return wrapper
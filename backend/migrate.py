@@ -0,0 +1,96 @@
+"""
+Versioned schema migrations.
+
+Each file in migrations/ is named <version>_<description>.sql and is applied
+once, in version order, inside its own transaction. Applied versions are
+recorded in the schema_migrations table. Under gunicorn this script is run
+before the workers fork, at startup and on every reload (see
+gunicorn.conf.py). A Postgres advisory lock still makes concurrent callers
+(e.g. several containers, or hypercorn workers starting together) take turns,
+so each migration runs exactly once.
+
+Run by hand with: python migrate.py (and DB_MIGRATE_ON_START=0 for the app)
+"""
+
+import os
+import re
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+# Arbitrary application-wide key for pg_advisory_lock
+_LOCK_KEY = 3900_0001
+
+_FILENAME = re.compile(r"^(\d+)_([\w-]+)\.sql$")
+
+
+def available_migrations(directory=MIGRATIONS_DIR) -> list[tuple[int, str, str]]:
+    """
+    List the migration files on disk.
+    Returns: list of (version, name, path) sorted by version
+    """
+    found = []
+    for filename in os.listdir(directory):
+        match = _FILENAME.match(filename)
+        if match:
+            found.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    found.sort()
+    versions = [version for version, _, _ in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"duplicate migration versions in {directory}")
+    return found
+
+
+def apply_migrations(conn, directory=MIGRATIONS_DIR) -> list[int]:
+    """
+    Apply every migration that has not been recorded yet.
+    Parameters: conn (psycopg2 connection, not in a transaction)
+    Returns: list of versions applied by this call
+    """
+    applied_now = []
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_lock(%s);", (_LOCK_KEY,))
+        conn.commit()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                  version INTEGER PRIMARY KEY,
+                  name TEXT NOT NULL,
+                  applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                );
+                """
+            )
+            cur.execute("SELECT version FROM schema_migrations;")
+            done = {row[0] for row in cur.fetchall()}
+        conn.commit()
+
+        for version, name, path in available_migrations(directory):
+            if version in done:
+                continue
+            with open(path) as f:
+                sql = f.read()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql)
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s);",
+                        (version, name),
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied_now.append(version)
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(%s);", (_LOCK_KEY,))
+        conn.commit()
+    return applied_now
+
+
+if __name__ == "__main__":
+    import db
+
+    applied = db.run_migrations(float(os.environ.get("DB_STARTUP_TIMEOUT", "30")))
+    print("Applied migrations:", applied or "none (up to date)")
@@ -0,0 +1,34 @@
+-- Running histogram of marks used by GET /stats. One row per distinct mark
+-- holding how many students currently have it, kept in step with students
+-- by the trigger below, so count/sum/min/max never need to scan students.
+CREATE TABLE IF NOT EXISTS student_mark_counts (
+  mark INTEGER PRIMARY KEY,
+  n BIGINT NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION student_mark_counts_apply() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.mark IS NOT NULL THEN
+    UPDATE student_mark_counts SET n = n - 1 WHERE mark = OLD.mark;
+    DELETE FROM student_mark_counts WHERE mark = OLD.mark AND n <= 0;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.mark IS NOT NULL THEN
+    INSERT INTO student_mark_counts (mark, n) VALUES (NEW.mark, 1)
+    ON CONFLICT (mark) DO UPDATE SET n = student_mark_counts.n + 1;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Rebuild the histogram from scratch while writers are held off, so rows
+-- seeded by init.sql (or written before this migration) are counted once.
+LOCK TABLE students IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS students_mark_counts ON students;
+CREATE TRIGGER students_mark_counts
+AFTER INSERT OR DELETE OR UPDATE OF mark ON students
+FOR EACH ROW EXECUTE FUNCTION student_mark_counts_apply();
+
+TRUNCATE student_mark_counts;
+INSERT INTO student_mark_counts (mark, n)
+SELECT mark, COUNT(*) FROM students WHERE mark IS NOT NULL GROUP BY mark;
@@ -0,0 +1,2 @@
+-- Course filtering and per-course mark ranges/aggregates
+CREATE INDEX IF NOT EXISTS students_course_mark_idx ON students (course, mark);
@@ -0,0 +1,10 @@
+-- Case-insensitive name search: a trigram index serves substring matches
+-- (lower(name) LIKE '%foo%') and a pattern-ops btree serves prefix matches
+-- (lower(name) LIKE 'foo%').
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS students_name_trgm_idx
+  ON students USING gin (lower(name) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS students_name_prefix_idx
+  ON students (lower(name) text_pattern_ops);
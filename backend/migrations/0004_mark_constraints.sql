@@ -0,0 +1,26 @@
+-- Enforce the create_student rules in the database: every student has a
+-- mark between 0 and 100, and a missing mark means 0.
+-- Existing rows that break the rules are not rewritten: the migration stops
+-- and names them, so they can be corrected by hand and the migration rerun.
+DO $$
+DECLARE
+  bad_count BIGINT;
+  bad_ids TEXT;
+BEGIN
+  SELECT COUNT(*), string_agg(id::text, ', ' ORDER BY id) FILTER (WHERE rn <= 20)
+    INTO bad_count, bad_ids
+    FROM (
+      SELECT id, row_number() OVER (ORDER BY id) AS rn
+        FROM students
+       WHERE mark IS NULL OR mark NOT BETWEEN 0 AND 100
+    ) bad;
+  IF bad_count > 0 THEN
+    RAISE EXCEPTION '% students have a missing or out-of-range mark (first ids: %)', bad_count, bad_ids
+      USING HINT = 'Set each of these marks to a value between 0 and 100, then restart to rerun the migration.';
+  END IF;
+END;
+$$;
+
+ALTER TABLE students ALTER COLUMN mark SET DEFAULT 0;
+ALTER TABLE students ALTER COLUMN mark SET NOT NULL;
+ALTER TABLE students ADD CONSTRAINT students_mark_range CHECK (mark BETWEEN 0 AND 100);
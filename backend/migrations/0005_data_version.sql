@@ -0,0 +1,21 @@
+-- Table-level change counter behind the ETags on GET /students and /stats.
+-- A statement trigger bumps it inside the writing transaction, so a new
+-- version only becomes visible together with the rows that caused it.
+CREATE TABLE IF NOT EXISTS students_version (
+  singleton BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (singleton),
+  version BIGINT NOT NULL
+);
+
+INSERT INTO students_version (version) VALUES (1) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION students_version_bump() RETURNS trigger AS $$
+BEGIN
+  UPDATE students_version SET version = version + 1;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS students_version_bump ON students;
+CREATE TRIGGER students_version_bump
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON students
+FOR EACH STATEMENT EXECUTE FUNCTION students_version_bump();
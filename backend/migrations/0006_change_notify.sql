@@ -0,0 +1,24 @@
+-- Broadcast committed changes on the students_changes channel (see
+-- backend/listener.py). NOTIFY is transactional, so listeners only hear about
+-- a write once it has committed. The payload is kept small; listeners load
+-- the row by id if they need it.
+CREATE OR REPLACE FUNCTION students_notify_change() RETURNS trigger AS $$
+DECLARE
+  payload json;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    payload := json_build_object('op', 'insert', 'id', NEW.id, 'course', NEW.course, 'old_course', NULL);
+  ELSIF TG_OP = 'UPDATE' THEN
+    payload := json_build_object('op', 'update', 'id', NEW.id, 'course', NEW.course, 'old_course', OLD.course);
+  ELSE
+    payload := json_build_object('op', 'delete', 'id', OLD.id, 'course', OLD.course, 'old_course', NULL);
+  END IF;
+  PERFORM pg_notify('students_changes', payload::text);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS students_notify_change ON students;
+CREATE TRIGGER students_notify_change
+AFTER INSERT OR UPDATE OR DELETE ON students
+FOR EACH ROW EXECUTE FUNCTION students_notify_change();
@@ -0,0 +1,47 @@
+-- Append-only history of every student change, for GET /students/<id>/history
+-- and GET /stats?as_of=. Rows are written by a trigger inside the writing
+-- transaction, so the app makes no extra round trips or commits, and writes
+-- from every worker (and from psql) are captured.
+CREATE TABLE IF NOT EXISTS student_history (
+  history_id BIGSERIAL PRIMARY KEY,
+  student_id INTEGER NOT NULL,
+  op TEXT NOT NULL CHECK (op IN ('insert', 'update', 'delete')),
+  -- The row after the change (the removed row for deletes)
+  name TEXT,
+  course TEXT,
+  mark INTEGER,
+  changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Serves both the per-student history and the latest-row-per-student lookup
+-- behind as_of stats; INCLUDE makes the latter an index-only scan.
+CREATE INDEX IF NOT EXISTS student_history_student_changed
+  ON student_history (student_id, changed_at, history_id) INCLUDE (op, mark);
+
+CREATE OR REPLACE FUNCTION students_record_history() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO student_history (student_id, op, name, course, mark)
+    VALUES (NEW.id, 'insert', NEW.name, NEW.course, NEW.mark);
+  ELSIF TG_OP = 'UPDATE' THEN
+    IF (NEW.name, NEW.course, NEW.mark) IS DISTINCT FROM (OLD.name, OLD.course, OLD.mark) THEN
+      INSERT INTO student_history (student_id, op, name, course, mark)
+      VALUES (NEW.id, 'update', NEW.name, NEW.course, NEW.mark);
+    END IF;
+  ELSE
+    INSERT INTO student_history (student_id, op, name, course, mark)
+    VALUES (OLD.id, 'delete', OLD.name, OLD.course, OLD.mark);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS students_record_history ON students;
+CREATE TRIGGER students_record_history
+AFTER INSERT OR UPDATE OR DELETE ON students
+FOR EACH ROW EXECUTE FUNCTION students_record_history();
+
+-- History starts now: existing students are recorded as inserted at migration time
+INSERT INTO student_history (student_id, op, name, course, mark)
+SELECT id, 'insert', name, course, mark FROM students
+WHERE NOT EXISTS (SELECT 1 FROM student_history);
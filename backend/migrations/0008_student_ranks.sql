@@ -0,0 +1,16 @@
+-- Per-course mark ranks for GET /courses/<course>/leaderboard and
+-- GET /students/<id>/rank. ranks.py refreshes the view CONCURRENTLY shortly
+-- after writes, so readers never block and lookups are plain index probes.
+CREATE MATERIALIZED VIEW IF NOT EXISTS student_ranks AS
+SELECT id AS student_id,
+       name,
+       course,
+       mark,
+       RANK() OVER (PARTITION BY course ORDER BY mark DESC) AS rank,
+       COUNT(*) OVER (PARTITION BY course) AS course_size
+  FROM students
+ WHERE mark IS NOT NULL AND course IS NOT NULL;
+
+-- REFRESH ... CONCURRENTLY needs a unique index; it also serves rank lookups
+CREATE UNIQUE INDEX IF NOT EXISTS student_ranks_student ON student_ranks (student_id);
+CREATE INDEX IF NOT EXISTS student_ranks_course_rank ON student_ranks (course, rank, student_id);
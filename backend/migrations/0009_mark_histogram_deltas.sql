@@ -0,0 +1,79 @@
+-- Replace the row-level histogram trigger from 0001. It updated one
+-- student_mark_counts row per changed mark and held those row locks until
+-- commit, so concurrent writers touching the same marks in a different order
+-- could deadlock, and every create contended on the row for its mark.
+--
+-- Writers now only ever INSERT into student_mark_deltas (one row per mark
+-- per statement, from the statement's transition tables), which never takes
+-- a lock another writer waits on. student_mark_counts becomes a view summing
+-- the deltas, and students_compact_counters() folds them back down to about
+-- one row per mark now and then.
+CREATE TABLE IF NOT EXISTS student_mark_deltas (
+  id BIGSERIAL PRIMARY KEY,
+  mark INTEGER NOT NULL,
+  n BIGINT NOT NULL
+);
+
+-- Hold writers off while the counts move over, so none is lost or doubled
+LOCK TABLE students IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS students_mark_counts ON students;
+DROP FUNCTION IF EXISTS student_mark_counts_apply();
+
+INSERT INTO student_mark_deltas (mark, n)
+SELECT mark, n FROM student_mark_counts WHERE n <> 0;
+DROP TABLE student_mark_counts;
+
+CREATE VIEW student_mark_counts AS
+SELECT mark, SUM(n)::bigint AS n FROM student_mark_deltas GROUP BY mark;
+
+CREATE OR REPLACE FUNCTION student_mark_deltas_apply() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO student_mark_deltas (mark, n)
+    SELECT mark, COUNT(*) FROM new_rows WHERE mark IS NOT NULL GROUP BY mark;
+  ELSIF TG_OP = 'DELETE' THEN
+    INSERT INTO student_mark_deltas (mark, n)
+    SELECT mark, -COUNT(*) FROM old_rows WHERE mark IS NOT NULL GROUP BY mark;
+  ELSE
+    INSERT INTO student_mark_deltas (mark, n)
+    SELECT mark, SUM(d) FROM (
+      SELECT mark, 1 AS d FROM new_rows WHERE mark IS NOT NULL
+      UNION ALL
+      SELECT mark, -1 AS d FROM old_rows WHERE mark IS NOT NULL
+    ) changes
+    GROUP BY mark HAVING SUM(d) <> 0;
+  END IF;
+  -- Keep the view cheap: fold the deltas every fifty or so write statements
+  IF random() < 0.02 THEN
+    PERFORM students_compact_counters();
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Folds the delta rows into one row per mark. Only one transaction compacts
+-- at a time, and ordinary writers only insert, so nothing waits on it.
+CREATE OR REPLACE FUNCTION students_compact_counters() RETURNS void AS $$
+BEGIN
+  IF NOT pg_try_advisory_xact_lock(hashtext('students_compact_counters')) THEN
+    RETURN;
+  END IF;
+  WITH moved AS (DELETE FROM student_mark_deltas RETURNING mark, n)
+  INSERT INTO student_mark_deltas (mark, n)
+  SELECT mark, SUM(n) FROM moved GROUP BY mark HAVING SUM(n) <> 0;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables need one trigger per event (and no column list)
+CREATE TRIGGER students_mark_deltas_insert
+AFTER INSERT ON students REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION student_mark_deltas_apply();
+
+CREATE TRIGGER students_mark_deltas_update
+AFTER UPDATE ON students REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION student_mark_deltas_apply();
+
+CREATE TRIGGER students_mark_deltas_delete
+AFTER DELETE ON students REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION student_mark_deltas_apply();
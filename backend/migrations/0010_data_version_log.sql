@@ -0,0 +1,50 @@
+-- Replace the singleton counter from 0005. Every write statement updated the
+-- same students_version row and held its lock until commit, so all writers
+-- queued behind each other on that one row.
+--
+-- Writers now insert one row into students_version_log per statement instead,
+-- and the version is the sum of the log. Inserts never wait on each other, and
+-- the sum only grows when a writing transaction commits, so a version still
+-- becomes visible together with the rows that caused it. (A sequence would
+-- not: nextval() is visible to everyone before the writer commits.)
+CREATE TABLE IF NOT EXISTS students_version_log (
+  id BIGSERIAL PRIMARY KEY,
+  bumps BIGINT NOT NULL
+);
+
+LOCK TABLE students IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS students_version_bump ON students;
+
+-- Carry the old counter over so existing ETags do not come back into use
+INSERT INTO students_version_log (bumps) SELECT version FROM students_version;
+DROP TABLE students_version;
+
+CREATE VIEW students_version AS
+SELECT COALESCE(SUM(bumps), 0)::bigint AS version FROM students_version_log;
+
+CREATE OR REPLACE FUNCTION students_version_bump() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO students_version_log (bumps) VALUES (1);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER students_version_bump
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON students
+FOR EACH STATEMENT EXECUTE FUNCTION students_version_bump();
+
+-- Fold the version log along with the mark deltas (see 0009)
+CREATE OR REPLACE FUNCTION students_compact_counters() RETURNS void AS $$
+BEGIN
+  IF NOT pg_try_advisory_xact_lock(hashtext('students_compact_counters')) THEN
+    RETURN;
+  END IF;
+  WITH moved AS (DELETE FROM student_mark_deltas RETURNING mark, n)
+  INSERT INTO student_mark_deltas (mark, n)
+  SELECT mark, SUM(n) FROM moved GROUP BY mark HAVING SUM(n) <> 0;
+  WITH moved AS (DELETE FROM students_version_log RETURNING bumps)
+  INSERT INTO students_version_log (bumps)
+  SELECT SUM(bumps) FROM moved HAVING COUNT(*) > 0;
+END;
+$$ LANGUAGE plpgsql;
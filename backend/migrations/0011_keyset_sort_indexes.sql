@@ -0,0 +1,7 @@
+-- Keyset pagination on GET /students orders by (sort column, id) and resumes
+-- with a row comparison (sort column, id) > (%s, %s). These indexes serve
+-- both the ordering and the bound for every sortable column, so deep pages
+-- cost the same as the first one instead of sorting the filtered table.
+CREATE INDEX IF NOT EXISTS students_name_id_idx ON students (name, id);
+CREATE INDEX IF NOT EXISTS students_course_id_idx ON students (course, id);
+CREATE INDEX IF NOT EXISTS students_mark_id_idx ON students (mark, id);
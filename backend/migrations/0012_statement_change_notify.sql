@@ -0,0 +1,75 @@
+-- Replace the row-level NOTIFY trigger from 0006. It queued one notification
+-- per changed row (100k+ for a large upload, enough to fill the notify
+-- queue), and every transaction that has queued a NOTIFY takes a
+-- database-wide lock at commit, so all writes serialised there even when
+-- nobody was listening.
+--
+-- Now each statement sends at most one notification, {"changes": [...]}
+-- with the same per-row entries as before, or {"op": "resync"} when it
+-- touched more than 50 rows or the payload would not fit. Sessions only
+-- notify when they set students.notify_changes = on, which the app does
+-- (see db.connection_params) only if something consumes the feed.
+DROP TRIGGER IF EXISTS students_notify_change ON students;
+DROP FUNCTION IF EXISTS students_notify_change();
+
+CREATE OR REPLACE FUNCTION students_notify_changes() RETURNS trigger AS $$
+DECLARE
+  row_count BIGINT;
+  payload TEXT;
+BEGIN
+  IF current_setting('students.notify_changes', true) IS DISTINCT FROM 'on' THEN
+    RETURN NULL;
+  END IF;
+  IF TG_OP = 'TRUNCATE' THEN
+    PERFORM pg_notify('students_changes', '{"op": "resync"}');
+    RETURN NULL;
+  END IF;
+
+  IF TG_OP = 'DELETE' THEN
+    SELECT COUNT(*) INTO row_count FROM old_rows;
+  ELSE
+    SELECT COUNT(*) INTO row_count FROM new_rows;
+  END IF;
+  IF row_count = 0 THEN
+    RETURN NULL;
+  END IF;
+  IF row_count > 50 THEN
+    PERFORM pg_notify('students_changes', '{"op": "resync"}');
+    RETURN NULL;
+  END IF;
+
+  IF TG_OP = 'INSERT' THEN
+    SELECT json_agg(json_build_object('op', 'insert', 'id', id, 'course', course, 'old_course', NULL) ORDER BY id)
+      INTO payload FROM new_rows;
+  ELSIF TG_OP = 'UPDATE' THEN
+    SELECT json_agg(json_build_object('op', 'update', 'id', nr.id, 'course', nr.course, 'old_course', orow.course) ORDER BY nr.id)
+      INTO payload FROM new_rows nr JOIN old_rows orow ON orow.id = nr.id;
+  ELSE
+    SELECT json_agg(json_build_object('op', 'delete', 'id', id, 'course', course, 'old_course', NULL) ORDER BY id)
+      INTO payload FROM old_rows;
+  END IF;
+  payload := '{"changes": ' || payload || '}';
+  -- NOTIFY payloads must stay under 8000 bytes
+  IF octet_length(payload) > 7900 THEN
+    payload := '{"op": "resync"}';
+  END IF;
+  PERFORM pg_notify('students_changes', payload);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER students_notify_insert
+AFTER INSERT ON students REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION students_notify_changes();
+
+CREATE TRIGGER students_notify_update
+AFTER UPDATE ON students REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION students_notify_changes();
+
+CREATE TRIGGER students_notify_delete
+AFTER DELETE ON students REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION students_notify_changes();
+
+CREATE TRIGGER students_notify_truncate
+AFTER TRUNCATE ON students
+FOR EACH STATEMENT EXECUTE FUNCTION students_notify_changes();
@@ -0,0 +1,14 @@
+-- TRUNCATE students fires no row or INSERT/UPDATE/DELETE statement triggers,
+-- so the mark deltas from 0009 would keep reporting the removed students.
+-- Clear them in the same transaction as the truncate.
+CREATE OR REPLACE FUNCTION student_mark_deltas_clear() RETURNS trigger AS $$
+BEGIN
+  DELETE FROM student_mark_deltas;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS students_mark_deltas_truncate ON students;
+CREATE TRIGGER students_mark_deltas_truncate
+AFTER TRUNCATE ON students
+FOR EACH STATEMENT EXECUTE FUNCTION student_mark_deltas_clear();
@@ -0,0 +1,209 @@
+"""
+Thread-safe PostgreSQL connection pool used by db.py.
+
+Connections are created lazily up to maxconn and handed out to whichever
+thread asks first. A checkout waits (up to timeout seconds) when every
+connection is busy instead of failing straight away, and connections that
+have been idle for a while are pinged before being handed out so a dropped
+server connection is replaced rather than surfaced as a request error.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became available within the checkout timeout."""
+
+
+class ConnectionPool:
+    def __init__(self, minconn=1, maxconn=10, timeout=10.0, ping_after=30.0, **dsn):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("pool size must satisfy 0 <= minconn <= maxconn, maxconn >= 1")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._dsn = dsn
+        self._cond = threading.Condition()
+        # Idle connections as (conn, returned_at) pairs, most recently used last
+        self._idle = deque()
+        self._size = 0
+        self._checkout_started = {}
+        self._closed = False
+
+        self.connections_opened = 0
+        self.connections_discarded = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.checkout_seconds_total = 0.0
+        self.checkout_seconds_max = 0.0
+
+        for _ in range(minconn):
+            self._idle.append((self._open(), time.monotonic()))
+            self._size += 1
+
+    def _open(self):
+        conn = psycopg2.connect(**self._dsn)
+        self.connections_opened += 1
+        return conn
+
+    def _healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if idle_for < self.ping_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        self.connections_discarded += 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def getconn(self):
+        """
+        Check out a connection, waiting up to `timeout` seconds for one to free up.
+        Raises PoolTimeout if the pool stayed exhausted for the whole wait.
+        """
+        requested = time.monotonic()
+        deadline = requested + self.timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise psycopg2.InterfaceError("connection pool is closed")
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    # Reserve the slot before connecting so other threads see it
+                    self._size += 1
+                    conn, returned_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f"no database connection available after {self.timeout}s "
+                        f"(maxconn={self.maxconn})"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+        try:
+            if conn is not None and not self._healthy(conn, time.monotonic() - returned_at):
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        now = time.monotonic()
+        wait = now - requested
+        with self._cond:
+            self.checkouts += 1
+            if waited:
+                self.waits += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+            self._checkout_started[id(conn)] = now
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """
+        Return a connection to the pool. Broken connections, or ones the caller
+        flags with discard=True, are closed and their slot is freed.
+        """
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        discard = discard or bool(conn.closed)
+
+        with self._cond:
+            started = self._checkout_started.pop(id(conn), None)
+            if started is not None:
+                held = time.monotonic() - started
+                self.checkout_seconds_total += held
+                self.checkout_seconds_max = max(self.checkout_seconds_max, held)
+            if discard or self._closed:
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if discard or self._closed:
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager around getconn/putconn. Commits when the block exits
+        cleanly, rolls back on error and drops the connection if it broke.
+        """
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        except BaseException:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn, discard=broken)
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "minconn": self.minconn,
+                "maxconn": self.maxconn,
+                "connections_opened": self.connections_opened,
+                "connections_discarded": self.connections_discarded,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "checkout_seconds_total": self.checkout_seconds_total,
+                "checkout_seconds_max": self.checkout_seconds_max,
+            }
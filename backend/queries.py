@@ -0,0 +1,220 @@
+"""
+SQL builders shared by the sync (db.py) and async (async_db.py) database layers.
+
+Queries are written with psycopg2-style %s placeholders; async_db converts
+them to asyncpg's $1, $2, ... form with numbered().
+"""
+
+import re
+
+SELECT_STUDENT = "SELECT id, name, course, mark FROM students WHERE id = %s;"
+SELECT_STUDENTS_BY_ID = "SELECT id, name, course, mark FROM students WHERE id = ANY(%s);"
+
+INSERT_STUDENT = (
+    "INSERT INTO students (name, course, mark) VALUES (%s, %s, %s) "
+    "RETURNING id, name, course, mark;"
+)
+
+# Group commit (group_commit.py): ids are drawn from the sequence up front so
+# each coalesced request can be handed back its own row whatever order the
+# multi-row INSERT is executed in.
+ALLOCATE_STUDENT_IDS = (
+    "SELECT nextval(pg_get_serial_sequence('students', 'id')) FROM generate_series(1, %s);"
+)
+INSERT_STUDENTS_WITH_IDS = "INSERT INTO students (id, name, course, mark) VALUES %s;"
+
+# Partial update in one statement: NULL (or '' for text) keeps the current value.
+# The locked subselect hands back the pre-update row alongside the new one.
+UPDATE_STUDENT = """
+    UPDATE students s
+       SET name = COALESCE(NULLIF(%s, ''), s.name),
+           course = COALESCE(NULLIF(%s, ''), s.course),
+           mark = COALESCE(%s, s.mark)
+      FROM (SELECT id, name, course, mark FROM students WHERE id = %s FOR UPDATE) old
+     WHERE s.id = old.id
+ RETURNING s.id, s.name, s.course, s.mark, old.name, old.course, old.mark;
+"""
+
+DELETE_STUDENT = "DELETE FROM students WHERE id = %s RETURNING id, name, course, mark;"
+
+# Set-based partial update of many students: one row per (id, name, course, mark)
+# in the VALUES list, with the same COALESCE rules as UPDATE_STUDENT. Used with
+# psycopg2's execute_values, which expands the single VALUES %s.
+BATCH_UPDATE_STUDENTS = """
+    WITH v (id, name, course, mark) AS (VALUES %s),
+         old AS (
+           SELECT st.id, st.name, st.course, st.mark
+             FROM students st JOIN v ON v.id = st.id
+              FOR UPDATE OF st
+         )
+    UPDATE students s
+       SET name = COALESCE(NULLIF(v.name, ''), s.name),
+           course = COALESCE(NULLIF(v.course, ''), s.course),
+           mark = COALESCE(v.mark, s.mark)
+      FROM v JOIN old ON old.id = v.id
+     WHERE s.id = v.id
+ RETURNING s.id, s.name, s.course, s.mark, old.name, old.course, old.mark;
+"""
+BATCH_UPDATE_TEMPLATE = "(%s::integer, %s::text, %s::text, %s::integer)"
+
+DELETE_STUDENTS_BY_ID = (
+    "DELETE FROM students WHERE id = ANY(%s) RETURNING id, name, course, mark;"
+)
+DELETE_STUDENTS_BY_COURSE = (
+    "DELETE FROM students WHERE course = %s RETURNING id, name, course, mark;"
+)
+
+# Select list for exports that emit each row as one ready-made JSON text line
+STUDENT_JSON = "json_build_object('id', id, 'name', name, 'course', course, 'mark', mark)::text"
+
+DATA_VERSION = "SELECT version FROM students_version;"
+
+# count, sum, min, max from the trigger-maintained histogram (migrations/0001, 0009)
+STATS = (
+    "SELECT SUM(n), SUM(mark::bigint * n), MIN(mark), MAX(mark) "
+    "FROM student_mark_counts WHERE n > 0;"
+)
+
+STUDENT_HISTORY = (
+    "SELECT op, name, course, mark, changed_at FROM student_history "
+    "WHERE student_id = %s ORDER BY changed_at, history_id;"
+)
+
+# Stats as they were at a point in time: each student's latest history row
+# at or before it, skipping students whose latest change was a delete.
+# The recursive CTE skips through the distinct student ids on the
+# (student_id, changed_at, history_id) index, and the LATERAL lookup descends
+# the same index once per student, so the cost follows the number of students
+# rather than the length of their history.
+STATS_AS_OF = """
+    WITH RECURSIVE ids AS (
+        (SELECT student_id FROM student_history ORDER BY student_id LIMIT 1)
+        UNION ALL
+        SELECT (SELECT h.student_id FROM student_history h
+                 WHERE h.student_id > ids.student_id
+                 ORDER BY h.student_id LIMIT 1)
+          FROM ids
+         WHERE ids.student_id IS NOT NULL
+    )
+    SELECT COUNT(latest.mark), SUM(latest.mark::bigint), MIN(latest.mark), MAX(latest.mark)
+      FROM ids
+      CROSS JOIN LATERAL (
+        SELECT h.op, h.mark
+          FROM student_history h
+         WHERE h.student_id = ids.student_id AND h.changed_at <= %s
+         ORDER BY h.changed_at DESC, h.history_id DESC
+         LIMIT 1
+      ) latest
+     WHERE latest.op <> 'delete';
+"""
+
+STUDENT_RANK = (
+    "SELECT student_id, name, course, mark, rank, course_size "
+    "FROM student_ranks WHERE student_id = %s;"
+)
+COURSE_LEADERBOARD = (
+    "SELECT student_id, name, course, mark, rank, course_size FROM student_ranks "
+    "WHERE course = %s ORDER BY rank, student_id LIMIT %s;"
+)
+# Transaction-scoped, so it is released by the refresh's own commit
+REFRESH_STUDENT_RANKS_LOCK = "SELECT pg_try_advisory_xact_lock(hashtext('student_ranks'));"
+REFRESH_STUDENT_RANKS = "REFRESH MATERIALIZED VIEW CONCURRENTLY student_ranks;"
+
+# Columns GET /students may sort by; anything else is rejected before SQL is built
+SORT_COLUMNS = ("id", "name", "course", "mark")
+
+
+def escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def student_filters(course=None, min_mark=None, max_mark=None, q=None):
+    """
+    Build the WHERE conditions shared by the list, stream and export queries.
+    Every condition is parameterised and matches an index from migrations/.
+    Returns: (list of SQL conditions, list of parameters)
+    """
+    conditions, params = [], []
+    if course is not None:
+        conditions.append("course = %s")
+        params.append(course)
+    if min_mark is not None:
+        conditions.append("mark >= %s")
+        params.append(min_mark)
+    if max_mark is not None:
+        conditions.append("mark <= %s")
+        params.append(max_mark)
+    if q:
+        # Case-insensitive substring match, served by the lower(name) trigram index
+        conditions.append("lower(name) LIKE %s")
+        params.append("%" + escape_like(q.lower()) + "%")
+    return conditions, params
+
+
+def student_query(filters=None, sort="id", order="asc", after=None, select="id, name, course, mark"):
+    """
+    Build SELECT id, name, course, mark with filters, ordering and a keyset bound.
+    Parameters: filters (dict of student_filters kwargs), sort (one of
+    SORT_COLUMNS), order ("asc" or "desc"), after ((sort value, id) of the last
+    row already seen, or None), select (select list, e.g. one JSON column)
+    Returns: (sql without a trailing LIMIT or semicolon, params)
+    """
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"cannot sort students by {sort!r}")
+    if order not in ("asc", "desc"):
+        raise ValueError(f"invalid sort order {order!r}")
+    conditions, params = student_filters(**(filters or {}))
+    if after is not None:
+        op = ">" if order == "asc" else "<"
+        if sort == "id":
+            conditions.append(f"id {op} %s")
+            params.append(after[1])
+        else:
+            # Row comparison keeps ties on the sort column in a stable id order
+            conditions.append(f"({sort}, id) {op} (%s, %s)")
+            params.extend(after)
+    sql = f"SELECT {select} FROM students"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if sort == "id":
+        sql += f" ORDER BY id {order}"
+    else:
+        sql += f" ORDER BY {sort} {order}, id {order}"
+    return sql, params
+
+
+def course_stats_query(course=None, buckets=10):
+    """
+    Build the per-course summary and mark histogram as one statement, so both
+    come from the same snapshot.
+    Parameters: course (str or None for every course), buckets (number of
+    10-mark histogram buckets; marks past the last bucket fall into it)
+    Returns: (sql, params); each row is course, count, mean, median, p25, p75,
+    p90, stddev, min, max, then one count per bucket
+    """
+    histogram = ", ".join(
+        f"COUNT(*) FILTER (WHERE LEAST(GREATEST(mark, 0) / 10, {buckets - 1}) = {i})"
+        for i in range(buckets)
+    )
+    sql = f"""
+        SELECT course, COUNT(mark), AVG(mark)::float8,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY mark),
+               percentile_cont(0.25) WITHIN GROUP (ORDER BY mark),
+               percentile_cont(0.75) WITHIN GROUP (ORDER BY mark),
+               percentile_cont(0.9) WITHIN GROUP (ORDER BY mark),
+               COALESCE(stddev_pop(mark), 0)::float8, MIN(mark), MAX(mark),
+               {histogram}
+          FROM students
+         WHERE mark IS NOT NULL{" AND course = %s" if course is not None else ""}
+         GROUP BY course ORDER BY course;
+    """
+    return sql, [course] if course is not None else []
+
+
+def numbered(sql):
+    """
+    Rewrite %s placeholders as $1, $2, ... for asyncpg.
+    The builders above never put a literal % in the SQL text itself.
+    """
+    counter = iter(range(1, sql.count("%s") + 1))
+    return re.sub(r"%s", lambda _: f"${next(counter)}", sql)
@@ -0,0 +1,79 @@
+"""
+Debounced refreshes of the student_ranks materialized view.
+
+Writes made through db.py in this process mark the ranks dirty. A refresher
+thread waits RANKS_REFRESH_DEBOUNCE_MS after the first such write, so a burst
+of writes costs one refresh, then runs db.refresh_student_ranks. The refresh
+is CONCURRENTLY, so rank and leaderboard reads are never blocked, and it is
+guarded by an advisory lock: if another worker is already refreshing, this
+one tries again after the next debounce instead of queueing behind it.
+Writes that land while a refresh is running trigger another one.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import db
+
+DEBOUNCE_SECONDS = float(os.environ.get("RANKS_REFRESH_DEBOUNCE_MS", "1000")) / 1000
+
+logger = logging.getLogger(__name__)
+
+_dirty = threading.Event()
+_thread = None
+_thread_pid = None
+_lock = threading.Lock()
+_counts = {"refreshes": 0, "skipped_locked": 0, "failures": 0, "last_refresh_seconds": 0.0}
+
+
+def schedule():
+    """Ask for a refresh after the debounce window."""
+    global _thread, _thread_pid
+    _dirty.set()
+    if _thread is not None and _thread.is_alive() and _thread_pid == os.getpid():
+        return
+    with _lock:
+        if _thread is None or not _thread.is_alive() or _thread_pid != os.getpid():
+            _thread = threading.Thread(target=_run, name="ranks-refresh", daemon=True)
+            _thread_pid = os.getpid()
+            _thread.start()
+
+
+def stats() -> dict:
+    with _lock:
+        return dict(_counts, pending=int(_dirty.is_set()))
+
+
+def _on_write(op, student, previous):
+    schedule()
+
+
+def _run():
+    while True:
+        _dirty.wait()
+        time.sleep(DEBOUNCE_SECONDS)
+        # Cleared before refreshing, so writes during the refresh set it again
+        _dirty.clear()
+        start = time.perf_counter()
+        try:
+            refreshed = db.refresh_student_ranks()
+        except Exception:
+            logger.exception("Refreshing student_ranks failed")
+            refreshed = None
+        with _lock:
+            if refreshed:
+                _counts["refreshes"] += 1
+                _counts["last_refresh_seconds"] = time.perf_counter() - start
+            elif refreshed is None:
+                _counts["failures"] += 1
+            else:
+                _counts["skipped_locked"] += 1
+        if not refreshed:
+            # Another worker holds the lock (or the db hiccuped): our writes
+            # may have committed after its refresh started, so go again
+            _dirty.set()
+
+
+db.add_write_listener(_on_write)
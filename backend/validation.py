@@ -0,0 +1,237 @@
+"""
+Request validation shared by the sync (app.py) and async (async_app.py) APIs.
+Nothing here depends on the web framework: functions take decoded bodies or
+query-string mappings and return plain values or error_msg messages.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime, timezone
+
+import error_msg
+import queries
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+DEFAULT_LEADERBOARD_SIZE = 10
+MAX_LEADERBOARD_SIZE = 100
+
+# Query-string parameters that switch GET /students from the legacy full
+# array to a paginated response
+LIST_PARAMS = ("after_id", "cursor", "limit", "course", "min_mark", "max_mark", "q", "sort", "order")
+
+
+def validate_new_student(student_data):
+    """
+    Validate the body of a create request.
+    param student_data: The decoded request body (anything json.loads can produce)
+    return: ((name, course, mark), None) with whitespace stripped when valid,
+    otherwise (None, error message)
+    """
+    if not isinstance(student_data, dict):
+        return None, error_msg.ERROR_JSON
+
+    name = student_data.get("name")
+    course = student_data.get("course")
+    mark = student_data.get("mark", None)
+    # Mark is optional on create and defaults to zero
+    if mark is None:
+        mark = 0
+
+    # Whitespace-only strings would strip down to nothing, so reject them too
+    if not isinstance(name, str) or name.strip() == "":
+        return None, error_msg.ERROR_NAME
+
+    if not isinstance(course, str) or course.strip() == "":
+        return None, error_msg.ERROR_COURSE
+
+    if isinstance(mark, bool) or not isinstance(mark, int) or mark > 100 or mark < 0:
+        return None, error_msg.ERROR_MARK
+
+    return (name.strip(), course.strip(), mark), None
+
+
+def validate_new_students(rows):
+    """
+    Validate a batch of create bodies in one pass.
+    param rows: Iterable of decoded request bodies
+    return: (list of (index, (name, course, mark))) for the valid rows and
+    (list of {"index": i, "error": message}) for the rejected ones
+    """
+    valid, errors = [], []
+    for index, row in enumerate(rows):
+        student, error = validate_new_student(row)
+        if error is None:
+            valid.append((index, student))
+        else:
+            errors.append({"index": index, "error": error})
+    return valid, errors
+
+
+def validate_student_update(student_data):
+    """
+    Validate the body of a (partial) update request. Fields that are missing
+    or null are left as None so db.update_student keeps the current value.
+    param student_data: The decoded request body, already known to be a dict
+    return: ((name, course, mark), None) with whitespace stripped when valid,
+    otherwise (None, error message)
+    """
+    name = student_data.get("name", None)
+    course = student_data.get("course", None)
+    mark = student_data.get("mark", None)
+
+    if name is not None and (not isinstance(name, str) or name.strip() == ""):
+        return None, error_msg.ERROR_NAME
+
+    if course is not None and (not isinstance(course, str) or course.strip() == ""):
+        return None, error_msg.ERROR_COURSE
+
+    if mark is not None and (isinstance(mark, bool) or not isinstance(mark, int) or mark > 100 or mark < 0):
+        return None, error_msg.ERROR_MARK
+
+    return (
+        name.strip() if name is not None else None,
+        course.strip() if course is not None else None,
+        mark,
+    ), None
+
+
+def validate_batch_update(items):
+    """
+    Validate the body of PATCH /students: a list of {id, name?, course?, mark?}.
+    param items: The decoded request body, already known to be a list
+    return: (list of (id, name, course, mark) for the valid entries, with later
+    entries for the same id replacing earlier ones, and list of
+    {"index": i, "error": message} for the rejected ones)
+    """
+    by_id, errors = {}, []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "error": error_msg.ERROR_JSON})
+            continue
+        student_id = item.get("id")
+        if isinstance(student_id, bool) or not isinstance(student_id, int) or student_id <= 0:
+            errors.append({"index": index, "error": error_msg.ERROR_ID})
+            continue
+        # Same field rules as PUT /students/<id>, reported per entry
+        changes, error = validate_student_update(item)
+        if error is not None:
+            errors.append({"index": index, "error": error})
+            continue
+        by_id.pop(student_id, None)
+        by_id[student_id] = (student_id, *changes)
+    return list(by_id.values()), errors
+
+
+def parse_timestamp(value):
+    """
+    Parse an ISO 8601 timestamp from a query string, e.g. ?as_of=2025-03-01T09:00:00Z.
+    Timestamps without an offset are taken as UTC.
+    return: timezone-aware datetime
+    raise: ValueError with a user-facing message
+    """
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(error_msg.ERROR_AS_OF) from None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def parse_leaderboard_limit(args):
+    """
+    Read ?limit= for a leaderboard.
+    return: int between 1 and MAX_LEADERBOARD_SIZE (default DEFAULT_LEADERBOARD_SIZE)
+    raise: ValueError with a user-facing message
+    """
+    try:
+        limit = _positive_int_arg(args, "limit")
+    except ValueError:
+        raise ValueError(error_msg.ERROR_LEADERBOARD_LIMIT) from None
+    if limit is None:
+        return DEFAULT_LEADERBOARD_SIZE
+    return min(limit, MAX_LEADERBOARD_SIZE)
+
+
+def parse_list_args(args):
+    """
+    Parse the filter, sort and paging parameters of GET /students.
+    param args: Mapping of query-string parameters
+    return: dict with filters, sort, order, after and limit
+    Raises ValueError (with an error_msg message) for malformed values.
+    """
+    try:
+        after_id = _positive_int_arg(args, "after_id")
+        limit = _positive_int_arg(args, "limit")
+    except ValueError:
+        raise ValueError(error_msg.ERROR_PAGE)
+    try:
+        min_mark = _positive_int_arg(args, "min_mark")
+        max_mark = _positive_int_arg(args, "max_mark")
+    except ValueError:
+        raise ValueError(error_msg.ERROR_MARK)
+
+    sort = args.get("sort", "id")
+    order = args.get("order", "asc").lower()
+    if sort not in queries.SORT_COLUMNS or order not in ("asc", "desc"):
+        raise ValueError(error_msg.ERROR_SORT)
+
+    after = None
+    if args.get("cursor"):
+        try:
+            after = decode_cursor(sort, args["cursor"])
+        except ValueError:
+            raise ValueError(error_msg.ERROR_PAGE)
+    elif after_id is not None:
+        if sort != "id":
+            raise ValueError(error_msg.ERROR_PAGE)
+        after = (after_id, after_id)
+
+    course = args.get("course", "").strip() or None
+    q = args.get("q", "").strip() or None
+    return {
+        "filters": {"course": course, "min_mark": min_mark, "max_mark": max_mark, "q": q},
+        "sort": sort,
+        "order": order,
+        "after": after,
+        "limit": min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE),
+    }
+
+
+def encode_cursor(sort, after):
+    # Opaque to clients: the sort column plus (sort value, id) of the last row on the page
+    return base64.urlsafe_b64encode(json.dumps([sort, *after]).encode()).decode()
+
+
+def decode_cursor(sort, cursor):
+    try:
+        cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError, binascii.Error, UnicodeDecodeError):
+        raise ValueError("malformed cursor")
+    # A cursor is only valid for the ordering it was issued under
+    if cursor_sort != sort or not _is_int(last_id):
+        raise ValueError("malformed cursor")
+    # ...and its value must have the sort column's type, or the query fails
+    if not (_is_int(value) if sort in ("id", "mark") else isinstance(value, str)):
+        raise ValueError("malformed cursor")
+    return value, last_id
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _positive_int_arg(args, key):
+    """
+    Read an optional positive integer from the query string.
+    Raises ValueError when the value is present but not a positive integer.
+    """
+    value = args.get(key)
+    if value is None or value == "":
+        return None
+    number = int(value)
+    if number < 0 or (key == "limit" and number == 0):
+        raise ValueError(key)
+    return number
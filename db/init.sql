@@ -1,3 +1,6 @@
+-- Base table and seed data only. Indexes, constraints and triggers are added
+-- by the versioned migrations in backend/migrations, applied at backend startup.
+
 CREATE TABLE students (
   id SERIAL PRIMARY KEY,
   name TEXT,
@@ -0,0 +1,10 @@
+#!/bin/bash
+# Runs once when the primary's data directory is first initialised: lets the
+# db-replica service (docker compose --profile replica) stream WAL from it.
+set -e
+
+psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" <<-SQL
+    CREATE ROLE ${REPLICATION_USER:-replicator} WITH REPLICATION LOGIN PASSWORD '${REPLICATION_PASSWORD:-replpass}';
+SQL
+
+echo "host replication ${REPLICATION_USER:-replicator} all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -1,23 +1,57 @@
-import { useState, useEffect } from 'react'
-import { getStudents, createStudent, updateStudent, deleteStudent } from './api'
+import { useState, useEffect, useRef } from 'react'
+import { getStudentsPage, createStudent, updateStudent, deleteStudent, subscribeChanges } from './api'
 import StudentForm from './components/StudentForm'
 import StudentTable from './components/StudentTable'
+import StudentFilters, { emptyQuery } from './components/StudentFilters'
 import EditStudentModal from './components/EditStudentModal'
 import './App.css'
 import Stats from './components/Stats'
 
+const PAGE_SIZE = 50
+
+// Does a pushed student belong in the current filtered view?
+const matchesQuery = (student, query) =>
+  (!query.course || student.course === query.course) &&
+  (query.min_mark === '' || student.mark >= Number(query.min_mark)) &&
+  (query.max_mark === '' || student.mark <= Number(query.max_mark)) &&
+  (!query.q || student.name.toLowerCase().includes(query.q.toLowerCase()))
+
+const compareBy = ({ sort, order }) => (a, b) => {
+  const c = a[sort] < b[sort] ? -1 : a[sort] > b[sort] ? 1 : a.id - b.id
+  return order === 'desc' ? -c : c
+}
+
+// Apply one delta from the change feed to the loaded rows. `complete` is true
+// once every page is loaded; before that, new rows arrive with later pages.
+const applyChange = (students, { id, student }, query, complete) => {
+  const rest = students.filter((s) => s.id !== id)
+  const present = rest.length !== students.length
+  if (!student || !matchesQuery(student, query)) return present ? rest : students
+  if (!complete) return present ? students.map((s) => (s.id === id ? student : s)) : students
+  return [...rest, student].sort(compareBy(query))
+}
+
 export default function App() {
   const [students, setStudents] = useState([])
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState(null)
   const [editing, setEditing] = useState(null)
+  const [query, setQuery] = useState(emptyQuery)
+  const [nextCursor, setNextCursor] = useState(null)
+  const [liveStats, setLiveStats] = useState(null)
+  const view = useRef({ query, complete: true })
+  view.current = { query, complete: nextCursor === null }
 
-  const load = async () => {
-    setLoading(true)
+  // Filtering and sorting happen on the server; only one page is downloaded at a time.
+  // The query comes from view.current, so the change feed's onResync (bound
+  // once, on mount) reloads with the filters in effect now.
+  const load = async (cursor = null) => {
+    setLoading(cursor === null)
     setError(null)
     try {
-      const data = await getStudents()
-      setStudents(data)
+      const page = await getStudentsPage({ ...view.current.query, limit: PAGE_SIZE, cursor })
+      setStudents((prev) => (cursor === null ? page.students : [...prev, ...page.students]))
+      setNextCursor(page.next_cursor)
     } catch (e) {
       setError(e.message)
     } finally {
@@ -27,13 +61,26 @@ export default function App() {
 
   useEffect(() => {
     load()
-  }, [])
+  }, [query])
+
+  // Other users' edits are pushed by the server instead of refetching the table
+  useEffect(
+    () =>
+      subscribeChanges({
+        onChange: (change) =>
+          setStudents((prev) => applyChange(prev, change, view.current.query, view.current.complete)),
+        onStats: setLiveStats,
+        onResync: () => load(),
+      }),
+    []
+  )
 
   const handleCreate = async (student) => {
     setError(null)
     try {
       const created = await createStudent(student)
-      setStudents((prev) => [...prev, created])
+      // Place it like a pushed change: only if it matches the filters, in sort order
+      setStudents((prev) => applyChange(prev, { id: created.id, student: created }, query, nextCursor === null))
     } catch (e) {
       setError(e.message)
     }
@@ -69,7 +116,7 @@ export default function App() {
       </header>
 
       <main className="main">
-        <Stats />
+        <Stats live={liveStats} />
         <section className="card form-card">
           <h2>Add a 3900 tutor</h2>
           <StudentForm onSubmit={handleCreate} />
@@ -83,11 +130,16 @@ export default function App() {
 
         <section className="card table-card">
           <h2>Students table</h2>
+          <StudentFilters query={query} onChange={setQuery} />
           {loading ? (
             <p className="loading">Loading…</p>
           ) : (
             <StudentTable
               students={students}
+              query={query}
+              onQueryChange={setQuery}
+              hasMore={nextCursor !== null}
+              onLoadMore={() => load(nextCursor)}
               onEdit={setEditing}
               onDelete={handleDelete}
             />
@@ -1,9 +1,38 @@
 const API_BASE = import.meta.env.VITE_API_URL ?? 'http://localhost:5000';
 
 export const getStudents = async () => {
-  const res = await fetch(`${API_BASE}/students`);
+  const res = await fetch(`${API_BASE}/students?format=columns`);
   if (!res.ok) throw new Error('Failed to fetch students');
-  return res.json();
+  const body = await res.json();
+  return Array.isArray(body) ? body : fromColumns(body);
+}
+
+const COLUMNS_TYPE = 'application/vnd.students.columns+json';
+
+// Turn a column-oriented table {id: [...], name: [...], ...} back into row objects
+export const fromColumns = (table) =>
+  table.id.map((id, i) => ({ id, name: table.name[i], course: table.course[i], mark: table.mark[i] }))
+
+// Fetch one page of students matching `params` (course, min_mark, max_mark,
+// q, sort, order, limit, cursor). Resolves to { students, next_cursor }.
+// The page is requested in the compact column format and expanded here.
+export const getStudentsPage = async (params = {}) => {
+  const query = new URLSearchParams(
+    Object.entries(params).filter(([, v]) => v !== '' && v != null)
+  )
+  query.set('format', 'columns')
+  const res = await fetch(`${API_BASE}/students?${query}`, {
+    headers: { Accept: `${COLUMNS_TYPE}, application/json;q=0.9` },
+  });
+  if (!res.ok) {
+    const err = await res.json().catch(() => ({}));
+    throw new Error(err.error || 'Failed to fetch students');
+  }
+  const page = await res.json();
+  if (res.headers.get('Content-Type')?.startsWith(COLUMNS_TYPE)) {
+    return { ...page, students: fromColumns(page.students) };
+  }
+  return page;
 }
 
 export const getStats = async() => {
@@ -46,3 +75,76 @@ export const deleteStudent = async (id) => {
   }
   return res.json();
 }
+
+// Apply many partial updates in one request: [{ id, name?, course?, mark? }].
+// Resolves to { updated, not_found, errors }.
+export const updateStudents = async (updates) => {
+  const res = await fetch(`${API_BASE}/students`, {
+    method: 'PATCH',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(updates),
+  });
+  if (!res.ok) {
+    const err = await res.json().catch(() => ({}));
+    throw new Error(err.error || 'Failed to update students');
+  }
+  return res.json();
+}
+
+// Delete by a list of ids, or by { course } to clear a whole course.
+// Resolves to { deleted, not_found }.
+export const deleteStudents = async (idsOrFilter) => {
+  const res = await fetch(`${API_BASE}/students`, {
+    method: 'DELETE',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(Array.isArray(idsOrFilter) ? { ids: idsOrFilter } : idsOrFilter),
+  });
+  if (!res.ok) {
+    const err = await res.json().catch(() => ({}));
+    throw new Error(err.error || 'Failed to delete students');
+  }
+  return res.json();
+}
+
+// Live changes pushed by the server (Server-Sent Events). The handlers receive
+// onChange({ op, id, student }), onStats(stats) and onResync() when deltas
+// were missed. EventSource retries dropped connections by itself, but gives
+// up for good on an error response (e.g. 503 when the server has no free
+// stream slots), so then we reconnect with backoff. Every reconnect calls
+// onResync, since changes made in between were never delivered. Returns a
+// function that closes the stream.
+export const subscribeChanges = ({ onChange, onStats, onResync }) => {
+  let source = null
+  let retryTimer = null
+  let delay = 1000
+  let missed = false
+  let closed = false
+
+  const connect = () => {
+    source = new EventSource(`${API_BASE}/students/changes`)
+    source.addEventListener('change', (e) => onChange?.(JSON.parse(e.data)))
+    source.addEventListener('stats', (e) => onStats?.(JSON.parse(e.data)))
+    source.addEventListener('resync', () => onResync?.())
+    source.onopen = () => {
+      delay = 1000
+      if (missed) {
+        missed = false
+        onResync?.()
+      }
+    }
+    source.onerror = () => {
+      if (closed) return
+      missed = true
+      if (source.readyState !== EventSource.CLOSED) return
+      retryTimer = setTimeout(connect, delay)
+      delay = Math.min(delay * 2, 60000)
+    }
+  }
+
+  connect()
+  return () => {
+    closed = true
+    clearTimeout(retryTimer)
+    source.close()
+  }
+}
@@ -2,10 +2,13 @@ import { useState, useEffect } from 'react'
 import { getStats } from '../../api';
 import S from './styles.module.css'
 
-export default function Stats() {
-  const [stats, setStats] = useState(null)
+// `live` is the latest aggregate from the change feed; until one arrives the
+// stats are fetched once.
+export default function Stats({ live = null }) {
+  const [fetched, setStats] = useState(null)
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState(null)
+  const stats = live ?? fetched
 
   useEffect(() => {
     let cancelled = false
@@ -24,8 +27,8 @@ export default function Stats() {
     return () => { cancelled = true }
   }, [])
 
-  if (loading) return <p className={S.statsLoading}>Loading stats…</p>
-  if (error) return <p className={S.statsError} role="alert">Stats: {error}</p>
+  if (loading && !live) return <p className={S.statsLoading}>Loading stats…</p>
+  if (error && !live) return <p className={S.statsError} role="alert">Stats: {error}</p>
   if (!stats) return null
 
   return (
@@ -0,0 +1,71 @@
+import { useState, useEffect } from 'react'
+import S from './styles.module.css'
+
+export const emptyQuery = { q: '', course: '', min_mark: '', max_mark: '', sort: 'id', order: 'asc' }
+
+// Wait for typing to pause before asking the server for a new page
+const DEBOUNCE_MS = 300
+
+export default function StudentFilters({ query, onChange }) {
+  const [draft, setDraft] = useState(query)
+
+  useEffect(() => {
+    setDraft(query)
+  }, [query])
+
+  useEffect(() => {
+    const changed = ['q', 'course', 'min_mark', 'max_mark'].some((k) => draft[k] !== query[k])
+    if (!changed) return
+    const timer = setTimeout(() => onChange({ ...query, ...draft }), DEBOUNCE_MS)
+    return () => clearTimeout(timer)
+  }, [draft])
+
+  function handleChange(e) {
+    const { name, value } = e.target
+    setDraft((prev) => ({ ...prev, [name]: value }))
+  }
+
+  return (
+    <div className={S.filters}>
+      <input
+        name="q"
+        type="search"
+        placeholder="Search name"
+        aria-label="Search name"
+        value={draft.q}
+        onChange={handleChange}
+      />
+      <input
+        name="course"
+        type="text"
+        placeholder="Course"
+        aria-label="Course"
+        value={draft.course}
+        onChange={handleChange}
+      />
+      <input
+        name="min_mark"
+        type="number"
+        min="0"
+        max="100"
+        placeholder="Min mark"
+        aria-label="Minimum mark"
+        value={draft.min_mark}
+        onChange={handleChange}
+      />
+      <input
+        name="max_mark"
+        type="number"
+        min="0"
+        max="100"
+        placeholder="Max mark"
+        aria-label="Maximum mark"
+        value={draft.max_mark}
+        onChange={handleChange}
+      />
+      <button type="button" className="btn btn-ghost btn-sm" onClick={() => onChange(emptyQuery)}>
+        Clear
+      </button>
+    </div>
+  )
+}
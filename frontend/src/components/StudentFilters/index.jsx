@@ -0,0 +1,3 @@
+import StudentFilters from "./StudentFilters";
+export { emptyQuery } from "./StudentFilters";
+export default StudentFilters;
@@ -1,18 +1,46 @@
 import S from './styles.module.css';
 
-export default function StudentTable({ students, onEdit, onDelete }) {
+const columns = [
+  { key: 'name', label: 'Name' },
+  { key: 'course', label: 'Course' },
+  { key: 'mark', label: 'Mark' },
+]
+
+export default function StudentTable({
+  students,
+  query,
+  onQueryChange,
+  hasMore,
+  onLoadMore,
+  onEdit,
+  onDelete,
+}) {
   if (!students.length) {
     return <p className={S.emptyState}>No students yet. Add one above.</p>
   }
 
+  // Clicking a header sorts by it on the server; clicking again flips the order
+  const toggleSort = (key) => {
+    const order = query.sort === key && query.order === 'asc' ? 'desc' : 'asc'
+    onQueryChange({ ...query, sort: key, order })
+  }
+
   return (
     <div className={S.tableWrap}>
       <table className={S.studentTable}>
         <thead>
           <tr>
-            <th>Name</th>
-            <th>Course</th>
-            <th>Mark</th>
+            {columns.map(({ key, label }) => (
+              <th
+                key={key}
+                aria-sort={query.sort === key ? (query.order === 'asc' ? 'ascending' : 'descending') : 'none'}
+              >
+                <button type="button" className={S.sortButton} onClick={() => toggleSort(key)}>
+                  {label}
+                  {query.sort === key && (query.order === 'asc' ? ' ▲' : ' ▼')}
+                </button>
+              </th>
+            ))}
             <th aria-label="Actions" />
           </tr>
         </thead>
@@ -50,6 +78,11 @@ export default function StudentTable({ students, onEdit, onDelete }) {
           ))}
         </tbody>
       </table>
+      {hasMore && (
+        <button type="button" className={`btn btn-ghost ${S.loadMore}`} onClick={onLoadMore}>
+          Load more
+        </button>
+      )}
     </div>
   )
 }